@@ -1,144 +1,305 @@
 """
 Auto play mine-sweeper game bot.
 """
+import time
 import random
 import logging
+from math import exp, log
 from auto.union_find import union_find
-from auto.find_solutions import find_solutions
+from auto.find_solutions import find_solutions, expired
+from auto.reduce_constraints import reduce_constraints
+from auto.patterns import PatternTable, load_table, window, mask_cells
+from auto.solution_cache import SolutionCache, signature, CACHE_SIZE
+from auto.pool import get_pool
+from auto.stats import BotStats
 from game import MineGame, STATUS, MASK, OPERATION
 
 # Use logger to display information
 logger = logging.getLogger('Bot')
 
+# Groups with at least this many cells are solved in worker processes
+PARALLEL_CELLS = 24
+
 
 class MineBot(object):
     """Automatically playing mine sweeping game."""
     rows: int
     cols: int
     board: list
+    frontier: set
     remain: int
     remain_mines: int
+    remain_unknowns: int
     probability_dict: dict
+    # Solutions of groups kept across turns and games
+    cache: SolutionCache
+    # Number of worker processes for large groups, 0 to solve inline
+    workers: int
+    # Random generator for guesses, global random state by default
+    rng: random.Random
+    # Timings and counters of analyze, None to disable
+    stats: BotStats
+    # Deductions of local patterns, None to disable
+    patterns: PatternTable
+    # Whether last analyze ran out of time before solving all groups
+    timed_out = False
+    # time.perf_counter() the current analyze should answer by
+    __deadline = None
+    __changes, __seen = None, 0
+    # Unknown / marked neighbors of each frontier cell
+    __neighbors: dict
+    # Frontier cells whose neighborhood changed since last naive inference
+    __dirty: set
+    # Constraints left by reduction inference: (keys, values)
+    __constraints: tuple
+
+    def __init__(self, cache_size: int = CACHE_SIZE, workers: int = 0,
+                 seed: int = None, stats: BotStats = None,
+                 patterns: bool = False):
+        self.cache = SolutionCache(cache_size)
+        self.workers = workers
+        self.rng = random if seed is None else random.Random(seed)
+        self.stats = stats
+        self.patterns = load_table() if patterns else None
 
     def see(self, game: MineGame) -> STATUS:
         # See details of game
         self.remain = game.remain
         self.remain_mines = game.mines - game.marked
-        self.rows, self.cols = game.rows, game.cols
-        self.board = [[game.view(row, col) for col in range(self.cols)] for row
-                      in range(self.rows)]
+        self.remain_unknowns = game.remain - game.marked
+        if game.changes is not self.__changes:
+            # A new game is started: begin with a blank board
+            self.rows, self.cols = game.rows, game.cols
+            self.board = [[MASK.UNKNOWN.value for _ in range(self.cols)] for _
+                          in range(self.rows)]
+            self.frontier, self.__neighbors, self.__dirty = set(), {}, set()
+            self.__changes, self.__seen = game.changes, 0
+        # Only look at cells changed since last time
+        changed = self.__changes[self.__seen:]
+        self.__seen = len(self.__changes)
+        touched = set()
+        for row, col in changed:
+            self.board[row][col] = game.view(row, col)
+            for ri in range(max(row - 1, 0), min(self.rows, row + 2)):
+                for ci in range(max(col - 1, 0), min(self.cols, col + 2)):
+                    touched.add((ri, ci))
+        # Known cells with unknown neighbors form the frontier,
+        # resolved cells leave it for good
+        for cell in touched:
+            row, col = cell
+            unknowns, marks = [], []
+            if self.board[row][col] >= 0:
+                unknowns, marks = self.__scan_neighbors(row, col)
+            if unknowns:
+                self.frontier.add(cell)
+                self.__neighbors[cell] = unknowns, marks
+                self.__dirty.add(cell)
+            elif cell in self.frontier:
+                self.frontier.remove(cell)
+                del self.__neighbors[cell]
+                self.__dirty.discard(cell)
         return game.status
 
-    def analyze(self, game: MineGame) -> list:
+    def __scan_neighbors(self, row: int, col: int) -> tuple:
+        # Find unknown and marked neighbors of cell [row, col]
+        unknowns, marks = [], []
+        for ri in range(max(row - 1, 0), min(self.rows, row + 2)):
+            for ci in range(max(col - 1, 0), min(self.cols, col + 2)):
+                if self.board[ri][ci] == MASK.UNKNOWN.value:
+                    unknowns.append((ri, ci))
+                elif self.board[ri][ci] == MASK.MARKED.value:
+                    marks.append((ri, ci))
+        return unknowns, marks
+
+    def analyze(self, game: MineGame, deadline: float = None) -> list:
         # Strategy:
-        # Naive -> advanced -> probabilistic / random -> (random)
+        # Naive -> reduction -> pattern -> advanced -> probabilistic / random
+        # deadline: seconds to answer within, None for no limit. When time
+        # runs out, groups left are not solved and groups are not weighed
+        # by the rest of the board: certain moves of groups solved in time
+        # or a guess by their probabilities are returned, and timed_out is
+        # set. Cells of unsolved groups get the average mine density
+        self.__deadline = None if deadline is None else \
+            time.perf_counter() + deadline
+        self.timed_out = False
         # See cells on board
-        self.see(game)
-        # Try naive inference
-        moves = self.__naive_infer()
-        # Try advanced inference
-        if len(moves) == 0:
-            self.probability_dict = {}
-            moves = self.__advanced_infer()
-            # Try probabilistic inference
-            if len(moves) == 0:
-                moves = self.__probabilistic_infer()
-                # Try random inference
-                if len(moves) == 0:
-                    moves = self.__random_infer()
-                    logger.debug(
-                        'Random algorithm: inferred {} moves'.format(
-                            len(moves)))
-                else:
-                    logger.debug(
-                        'Probabilistic algorithm: inferred {} moves'.format(
-                            len(moves)))
-            else:
-                logger.debug(
-                    'Advanced algorithm: inferred {} moves'.format(len(moves)))
-        else:
-            logger.debug(
-                'Naive algorithm: inferred {} moves'.format(len(moves)))
-        return list(moves)
+        self.__run('see', self.see, game)
+        self.probability_dict = {}
+        strategies = [('naive', self.__naive_infer),
+                      ('reduction', self.__reduction_infer),
+                      ('pattern', self.__pattern_infer),
+                      ('advanced', self.__advanced_infer),
+                      ('probabilistic', self.__probabilistic_infer),
+                      ('random', self.__random_infer)]
+        # Try each strategy until some moves are inferred
+        for name, strategy in strategies:
+            moves = self.__run(name, strategy)
+            if len(moves) > 0:
+                logger.debug('{} algorithm: inferred {} moves'.format(
+                    name.capitalize(), len(moves)))
+                break
+        # Seeing and cheaper strategies do not check the deadline,
+        # report an overrun of them too
+        if expired(self.__deadline):
+            self.timed_out = True
+        if self.stats is not None:
+            guesses = len(moves) if name in ('probabilistic', 'random') else 0
+            self.stats.end_turn(guesses, self.timed_out)
+        # Order of a set of moves depends on hash of OPERATION (a string
+        # hash, randomized per process), sort them to keep games reproducible
+        return sorted(moves, key=lambda move: (move[0].value, *move[1:]))
+
+    def __run(self, name: str, strategy, *args):
+        # Run a strategy, record its time and moves if stats are enabled
+        if self.stats is None:
+            return strategy(*args)
+        start = time.perf_counter()
+        result = strategy(*args)
+        moves = len(result) if isinstance(result, set) else 0
+        self.stats.record(name, time.perf_counter() - start, moves)
+        return result
 
     def __naive_infer(self) -> set:
         # Infer cells: naive algorithm
         moves = set()
-        # Scan all known cells and infer mines / safe cells
-        for row in range(self.rows):
-            for col in range(self.cols):
-                value = self.board[row][col]
-                # Known cell
-                if value >= 0:
-                    unknowns, marks = [], []
-                    for ri in range(max(row - 1, 0),
-                                    min(self.rows, row + 2)):
-                        for ci in range(max(col - 1, 0),
-                                        min(self.cols, col + 2)):
-                            if self.board[ri][ci] == MASK.UNKNOWN.value:
-                                unknowns.append((ri, ci))
-                            elif self.board[ri][ci] == MASK.MARKED.value:
-                                marks.append((ri, ci))
-                    # Uncover all unknowns
-                    if len(marks) == value:
-                        moves.update(
-                            [(OPERATION.UNCOVER, r, c) for r, c in
-                             unknowns])
-                    # Mark all unknowns
-                    elif len(unknowns) == value - len(marks):
-                        moves.update(
-                            [(OPERATION.MARK, r, c) for r, c in
-                             unknowns])
+        # Only re-examine frontier cells whose neighborhood changed,
+        # others could not yield new moves
+        for row, col in self.__dirty:
+            value = self.board[row][col]
+            unknowns, marks = self.__neighbors[row, col]
+            # Uncover all unknowns
+            if len(marks) == value:
+                moves.update([(OPERATION.UNCOVER, r, c) for r, c in unknowns])
+            # Mark all unknowns
+            elif len(unknowns) == value - len(marks):
+                moves.update([(OPERATION.MARK, r, c) for r, c in unknowns])
+        self.__dirty.clear()
         return moves
 
-    def __advanced_infer(self) -> set:
+    def __reduction_infer(self) -> set:
+        # Infer cells by comparing pairs of constraints,
+        # constraints left are kept for advanced inference
         moves = set()
         # Extract relations
         constraint_keys, constraint_values = self.__extract_constraints()
+        clean_cells, mine_cells, constraint_keys, constraint_values = \
+            reduce_constraints(constraint_keys, constraint_values)
+        self.__constraints = constraint_keys, constraint_values
+        moves.update([(OPERATION.UNCOVER, r, c) for r, c in clean_cells])
+        moves.update([(OPERATION.MARK, r, c) for r, c in mine_cells])
+        return moves
+
+    def __pattern_infer(self) -> set:
+        # Infer cells by looking up windows around frontier cells
+        # in the table of local patterns
+        moves = set()
+        if self.patterns is None:
+            return moves
+        for row, col in self.frontier:
+            found = self.patterns.lookup(window(
+                self.board, self.rows, self.cols, row, col, self.__neighbors))
+            if found is not None:
+                clean, mines = found
+                moves.update([(OPERATION.UNCOVER, r, c) for r, c in
+                              mask_cells(clean, row, col)])
+                moves.update([(OPERATION.MARK, r, c) for r, c in
+                              mask_cells(mines, row, col)])
+        return moves
+
+    def __advanced_infer(self) -> set:
+        moves = set()
+        constraint_keys, constraint_values = self.__constraints
         # Split relations into disjoint groups to reduce search space
         group_keys_list, group_values_list = self.__split_constraints(
             constraint_keys,
             constraint_values)
-        group_count = len(group_keys_list)
-        # Combine constraints of each group to infer mines
-        for i in range(group_count):
-            group_keys, group_values = group_keys_list[i], group_values_list[i]
-            cells, all_solutions = find_solutions(group_keys, group_values)
-            # Use a filter to remove impossible solutions:
-            # total mines exceeds remains
-            low, high = 1, self.remain_mines - group_count + 1
-            all_solutions = list(
-                filter(lambda sol: low <= sum(sol) <= high, all_solutions))
-            clean_cells, mine_cells = self.__find_common_infer(cells,
-                                                               all_solutions)
-            moves.update([(OPERATION.UNCOVER, r, c) for r, c in clean_cells])
-            moves.update([(OPERATION.MARK, r, c) for r, c in mine_cells])
+        # Count solutions of each group by number of mines
+        groups, others = [], self.remain_unknowns
+        results = self.__solve_groups(group_keys_list, group_values_list)
+        for cells, solution_counts, exact, _ in results:
+            if exact:
+                groups.append((cells, solution_counts))
+                others -= len(cells)
+            else:
+                # Estimated groups are treated as unconstrained cells,
+                # only their probabilities are used
+                self.__estimate_probability(cells, solution_counts)
+        if expired(self.__deadline):
+            # Cells certain in all solutions of their group are certain
+            # anyway, skip combining groups
+            self.timed_out = True
+            clean_cells, mine_cells = [], []
+            for cells, solution_counts in groups:
+                clean, mines = self.__group_infer(cells, solution_counts)
+                clean_cells.extend(clean)
+                mine_cells.extend(mines)
+        else:
+            # Combine groups to infer mines
+            clean_cells, mine_cells = self.__find_common_infer(groups,
+                                                               others)
+        moves.update([(OPERATION.UNCOVER, r, c) for r, c in clean_cells])
+        moves.update([(OPERATION.MARK, r, c) for r, c in mine_cells])
         return moves
 
+    def __solve_groups(self, group_keys_list: list,
+                       group_values_list: list) -> list:
+        # Find solutions of all groups, reuse them if group is unchanged.
+        # In parallel mode large groups are sent to worker processes.
+        # Groups left when deadline passes are skipped
+        results, futures = [], {}
+        for i in range(len(group_keys_list)):
+            group_keys, group_values = group_keys_list[i], group_values_list[i]
+            key = signature(group_keys, group_values)
+            result = self.cache.get(key)
+            if result is None:
+                if expired(self.__deadline):
+                    # Left unsolved, as if no solution was found
+                    self.timed_out = True
+                    results.append((list(set().union(*group_keys)), {},
+                                    False, 0))
+                    continue
+                # Estimation is seeded by the group itself,
+                # so results do not depend on where it is solved.
+                # perf_counter is system-wide, so is the deadline
+                rng = random.Random(hash(key))
+                if self.workers > 0 and len(
+                        set().union(*group_keys)) >= PARALLEL_CELLS:
+                    futures[i] = key, get_pool(self.workers).submit(
+                        find_solutions, group_keys, group_values, rng=rng,
+                        deadline=self.__deadline)
+                else:
+                    result = find_solutions(group_keys, group_values,
+                                            rng=rng, deadline=self.__deadline)
+                    self.__store(key, result)
+            elif self.stats is not None:
+                self.stats.record_group(len(result[0]))
+            results.append(result)
+        for i, (key, future) in futures.items():
+            results[i] = future.result()
+            self.__store(key, results[i])
+        return results
+
+    def __store(self, key: frozenset, result: tuple):
+        # Cache solutions of a group, unless deadline cut the search short
+        if expired(self.__deadline):
+            self.timed_out = True
+        else:
+            self.cache.put(key, result)
+        if self.stats is not None:
+            self.stats.record_group(len(result[0]), result[3])
+
     def __extract_constraints(self) -> tuple:
         # Extract constraints to represent n cells containing m mines:
         # key: set(c1, c2, c3, ..., cn) <-> value: m
         # However set is not hashable in python, so I use two lists
         constraint_keys, constraint_values = [], []
-        # Scan all known cells and infer mines / safe cells
-        for row in range(self.rows):
-            for col in range(self.cols):
-                value = self.board[row][col]
-                # Known cell
-                if value >= 0:
-                    unknowns, marks = [], []
-                    for ri in range(max(row - 1, 0),
-                                    min(self.rows, row + 2)):
-                        for ci in range(max(col - 1, 0),
-                                        min(self.cols, col + 2)):
-                            if self.board[ri][ci] == MASK.UNKNOWN.value:
-                                unknowns.append((ri, ci))
-                            elif self.board[ri][ci] == MASK.MARKED.value:
-                                marks.append((ri, ci))
-                    # Add relation for unknown cells
-                    if len(unknowns) > 0:
-                        constraint_keys.append(set(unknowns))
-                        constraint_values.append(value - len(marks))
+        # Scan known cells on frontier
+        for row, col in self.frontier:
+            value = self.board[row][col]
+            unknowns, marks = self.__neighbors[row, col]
+            # Add relation for unknown cells
+            constraint_keys.append(set(unknowns))
+            constraint_values.append(value - len(marks))
         return constraint_keys, constraint_values
 
     @staticmethod
@@ -147,15 +308,17 @@ class MineBot(object):
         # Split constraints into disjoint groups
         group_keys_list, group_values_list = [], []
         # Extract connect edges of relations
-        # If two constraints are connected,
-        # decision on one would influence on the other
+        # If two constraints are connected (have common cells),
+        # decision on one would influence on the other:
+        # connect each constraint to the first constraint of its cells
         count = len(constraint_keys)
-        connect_edges = []
+        connect_edges, first_constraint = [], {}
         for i in range(count):
-            for j in range(i + 1, count):
-                # Have common cells
-                if constraint_keys[i] & constraint_keys[j]:
-                    connect_edges.append((i, j))
+            for cell in constraint_keys[i]:
+                if cell in first_constraint:
+                    connect_edges.append((first_constraint[cell], i))
+                else:
+                    first_constraint[cell] = i
         # Use union find to get connected groups
         # group_indices_list: [[indices of group 0], [indices of group 1], ...]
         group_indices_list = union_find(connect_edges, count)
@@ -169,32 +332,120 @@ class MineBot(object):
             group_values_list.append(group_values)
         return group_keys_list, group_values_list
 
-    def __find_common_infer(self, cells: list, all_solutions: list) -> tuple:
+    def __find_common_infer(self, groups: list, others: int) -> tuple:
         # Analyze clean / mine cells by
-        # finding common cells in ALL feasible solutions
+        # finding common cells in ALL feasible solutions of all groups,
+        # where remain mines not used by groups lie in other unknown cells
         clean_cells, mine_cells = [], []
-        # Get the sum of solution
-        solution_count = len(all_solutions)
-        if solution_count > 0:
-            for i in range(len(cells)):
-                cell, mine_probability = cells[i], 0
-                for solution in all_solutions:
-                    mine_probability += solution[i]
-                mine_probability /= solution_count
-                if mine_probability == 0:
-                    clean_cells.append(cells[i])
-                elif mine_probability == 1:
-                    mine_cells.append(cells[i])
+        # Distribution of number of mines in each group
+        distributions = [{mines: counts[0] for mines, counts in
+                          solution_counts.items()} for _, solution_counts in
+                         groups]
+        # Distributions of groups before / after each group
+        prefixes, suffixes = [{0: 1}], [{0: 1}]
+        for distribution in distributions:
+            prefixes.append(self.__convolve(prefixes[-1], distribution))
+        for distribution in reversed(distributions):
+            suffixes.append(self.__convolve(distribution, suffixes[-1]))
+        suffixes.reverse()
+        weights = self.__rest_weights(prefixes[-1], others)
+        if not weights:
+            return clean_cells, mine_cells
+        for i, (cells, solution_counts) in enumerate(groups):
+            rest = self.__convolve(prefixes[i], suffixes[i + 1])
+            # Weighted number of solutions where each cell is mine / clean
+            total = 0
+            mine_counts = [0 for _ in range(len(cells))]
+            clean_counts = [0 for _ in range(len(cells))]
+            for mines, (count, cell_counts) in solution_counts.items():
+                rest_weight = sum(rest_count * weights.get(
+                    mines + rest_mines, 0) for rest_mines, rest_count in
+                    rest.items())
+                total += count * rest_weight
+                for j in range(len(cells)):
+                    mine_counts[j] += cell_counts[j] * rest_weight
+                    clean_counts[j] += (count - cell_counts[j]) * rest_weight
+            if total == 0:
+                continue
+            for j in range(len(cells)):
+                if mine_counts[j] == 0:
+                    clean_cells.append(cells[j])
+                elif clean_counts[j] == 0:
+                    mine_cells.append(cells[j])
                 else:
                     # Record probability of this cell being mine
-                    self.probability_dict[cell] = mine_probability
+                    self.probability_dict[cells[j]] = mine_counts[j] / total
         return clean_cells, mine_cells
 
+    def __rest_weights(self, distribution: dict, others: int) -> dict:
+        # Ways to place the rest of mines in other cells, by number of
+        # mines in groups, relative to the largest of them: only ratios
+        # are used. Computed in log space stepping by
+        # comb(n, k + 1) / comb(n, k) = (n - k) / (k + 1)
+        rests = [self.remain_mines - mines for mines in distribution]
+        rests = [rest for rest in rests if 0 <= rest <= others]
+        if not rests:
+            return {}
+        low, high = min(rests), max(rests)
+        logs = [0.]
+        for rest in range(low, high):
+            logs.append(logs[-1] + log((others - rest) / (rest + 1)))
+        top = max(logs[rest - low] for rest in rests)
+        return {self.remain_mines - rest: exp(logs[rest - low] - top)
+                for rest in rests}
+
+    def __estimate_probability(self, cells: list,
+                               solution_counts: dict) -> None:
+        # Record probability of cells being mine in sampled solutions,
+        # average mine density if none was found in time
+        total = sum(counts[0] for counts in solution_counts.values())
+        if total == 0:
+            density = self.remain_mines / max(self.remain_unknowns, 1)
+            for cell in cells:
+                self.probability_dict[cell] = density
+            return
+        for j in range(len(cells)):
+            mine_count = sum(counts[1][j] for counts in
+                             solution_counts.values())
+            self.probability_dict[cells[j]] = mine_count / total
+
+    def __group_infer(self, cells: list, solution_counts: dict) -> tuple:
+        # Clean / mine cells in all solutions of a group alone,
+        # record probabilities of others within the group
+        clean_cells, mine_cells = [], []
+        total = sum(counts[0] for counts in solution_counts.values())
+        for j in range(len(cells)):
+            mine_count = sum(counts[1][j] for counts in
+                             solution_counts.values())
+            if mine_count == 0:
+                clean_cells.append(cells[j])
+            elif mine_count == total:
+                mine_cells.append(cells[j])
+            else:
+                self.probability_dict[cells[j]] = mine_count / total
+        return clean_cells, mine_cells
+
+    @staticmethod
+    def __convolve(first: dict, second: dict) -> dict:
+        # Distribution of sum of mines of two independent groups,
+        # scaled to a largest count of 1 so products of many groups do not
+        # overflow floats: only ratios are used
+        result = {}
+        for first_mines, first_count in first.items():
+            for second_mines, second_count in second.items():
+                mines = first_mines + second_mines
+                result[mines] = result.get(mines, 0) + \
+                    first_count * second_count
+        top = max(result.values(), default=0)
+        if top == 0:
+            return result
+        return {mines: count / top for mines, count in result.items()}
+
     def __probabilistic_infer(self) -> set:
         # Generate random uncover moves based on probability calculated using
         # all solutions inferred in advanced_inferences
         moves = set()
-        min_prob, min_cell = 0, None
+        min_prob, min_cell = 1, None
         for cell, probability in self.probability_dict.items():
             if probability < min_prob:
                 min_prob = probability
@@ -205,9 +456,9 @@ class MineBot(object):
 
     def __random_infer(self) -> set:
         # Final inference: generate a random uncover move
-        row = random.randint(0, self.rows - 1)
-        col = random.randint(0, self.cols - 1)
+        row = self.rng.randint(0, self.rows - 1)
+        col = self.rng.randint(0, self.cols - 1)
         while self.board[row][col] != MASK.UNKNOWN.value:
-            row = random.randint(0, self.rows - 1)
-            col = random.randint(0, self.cols - 1)
+            row = self.rng.randint(0, self.rows - 1)
+            col = self.rng.randint(0, self.cols - 1)
         return {(OPERATION.UNCOVER, row, col)}
@@ -0,0 +1,70 @@
+"""
+Build the table of local patterns from games played by a bot without it:
+count windows around frontier cells, keep frequent ones with deductions
+beyond pairwise reduction, and save them to `auto/patterns.json.gz`.
+"""
+import gzip
+import json
+import random
+import logging
+from collections import Counter
+from game import MineGame, STATUS
+from auto.bot import MineBot
+from auto.patterns import PATTERN_FILE, SIZE, window, canonical, \
+    solve_window, beyond_reduction
+
+# Keep patterns seen at least this many times
+MIN_COUNT = 2
+
+
+def collect(shape: tuple, mines: int, games: int, seed: int = 0) -> Counter:
+    # Count canonical windows around frontier cells in games played by
+    # a bot without patterns
+    counter = Counter()
+    game = MineGame()
+    for index in range(games):
+        game.start(*shape, mines, seed=seed + index)
+        bot = MineBot(seed=seed + index, patterns=False)
+        while game.status == STATUS.RUNNING:
+            moves = bot.analyze(game)
+            board = game.board.tolist()
+            for row, col in bot.frontier:
+                counter[canonical(window(board, game.rows, game.cols, row,
+                                         col))] += 1
+            game.move_many(moves)
+    return counter
+
+
+def build(counter: Counter, min_count: int = MIN_COUNT) -> list:
+    # Patterns (key, clean, mines) of frequent windows with deductions
+    # beyond pairwise reduction, most frequent first
+    patterns = []
+    for key, count in counter.most_common():
+        if count < min_count:
+            break
+        clean, mines = solve_window(key)
+        if (clean or mines) and beyond_reduction(key, clean, mines):
+            patterns.append((key, clean, mines))
+    return patterns
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    counter = Counter()
+    # Shapes and mine densities of classic levels and larger boards
+    for shape, mines, games in [((16, 16), 40, 2000), ((30, 16), 99, 2000),
+                                ((40, 40), 240, 200), ((40, 40), 320, 200)]:
+        counter.update(collect(shape, mines, games,
+                               seed=random.Random(mines).randrange(2 ** 32)))
+        logging.info('{} x {}, {} mines: {} windows'.format(
+            *shape, mines, len(counter)))
+    patterns = build(counter)
+    with gzip.open(PATTERN_FILE, 'wt') as file:
+        json.dump({'size': SIZE, 'patterns': patterns}, file,
+                  separators=(',', ':'))
+    logging.info('{} patterns saved to {}'.format(len(patterns),
+                                                  PATTERN_FILE))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,86 +1,220 @@
 """
-Find all feasible solutions for a group of constraints using backtracking.
-Set threshold of a locality to avoid too much computation...
+Count all feasible solutions for a group of constraints using backtracking.
+Solutions are aggregated by number of mines instead of being stored.
+Set threshold of a locality to avoid too much computation:
+large groups are searched within a budget, then estimated by sampling.
+An optional deadline stops the search: samples found so far are kept,
+counts of a partial exhaustive search are biased and dropped.
 """
+import time
+import random
 
-# If number of cells exceeds it, we give up trying to find a solution...
+# If number of cells exceeds it, exact search is limited by a budget...
 MAX_CELLS = 48
+# Search nodes allowed to count solutions of a large group exactly
+MAX_NODES = 20000
+# Number of sampled solutions to estimate a large group,
+# and search nodes allowed for each sample
+SAMPLES, SAMPLE_NODES = 100, 500
 
 
-def find_solutions(constraint_keys: list, constraint_values: list) -> tuple:
-    # Find all feasible solutions
-    all_solutions = []
-    # Extract all cells' positions
-    cells = set()
-    for cell_set in constraint_keys:
-        cells.update(cell_set)
-    cells = list(cells)
+def find_solutions(constraint_keys: list, constraint_values: list,
+                   budget: int = MAX_NODES, samples: int = SAMPLES,
+                   rng: random.Random = None, deadline: float = None) -> tuple:
+    # Count all feasible solutions, return cells, a dict:
+    # {number of mines: [number of solutions,
+    #                    [number of solutions where cell i is mine]]}
+    # whether the counts are exact or estimated from samples,
+    # and number of search nodes visited
+    # deadline: time.perf_counter() to stop at, counts are not exact then,
+    # and empty if the deadline passed before sampling
+    solution_counts = {}
+    # Extract all cells' positions, neighboring cells are put together
+    cells = order_cells(constraint_keys)
     count = len(cells)
-    is_mine = [False for _ in range(count)]
     if count <= MAX_CELLS:
         # Use backtracking to discover all feasible solutions
-        backtracking(all_solutions, constraint_keys, constraint_values, 0,
-                     cells, is_mine)
-    return cells, all_solutions
-
-
-def backtracking(all_solutions: list, constraint_keys: list,
-                 constraint_values: list, curr_index: int, cell_list: list,
-                 is_mine: list) -> None:
-    def feasible(exact: bool = False) -> bool:
-        # Check whether current decision stays consistent with constraints
-        violate = False
-        # Check each constraint
-        for i in range(len(constraint_keys)):
-            cell_set, total_mines = constraint_keys[i], constraint_values[i]
-            mine_count, cell_count = 0, 0
-            # mine_count: number of mines in cells already decided
-            # cell_count: number of cells already decided
-            for j in range(curr_index + 1):
-                if cell_list[j] in cell_set:
-                    mine_count += is_mine[j]
-                    cell_count += 1
-            if not exact:
-                # Check whether violates constraint
-                # If current number of mines is too large
-                if mine_count > total_mines:
-                    violate = True
-                # If current number of mines is too small
-                elif mine_count < total_mines - (len(cell_set) - cell_count):
-                    violate = True
-            elif mine_count != total_mines:  # Exact satisfy all constraints
-                violate = True
-            if violate:
-                break
-        return not violate
-
-    # A feasible solution is generated
-    if curr_index == len(cell_list):
-        all_solutions.append(is_mine.copy())
-    else:
-        # Requires exactly match for last cell
-        exact_match = curr_index == len(cell_list) - 1
+        nodes = backtracking(solution_counts, constraint_keys,
+                             constraint_values, cells, deadline=deadline)
+        if expired(deadline):
+            return cells, {}, False, nodes
+        return cells, solution_counts, True, nodes
+    # Large group: try to count exactly within budget
+    nodes = backtracking(solution_counts, constraint_keys, constraint_values,
+                         cells, budget, deadline=deadline)
+    if expired(deadline):
+        return cells, {}, False, nodes
+    if nodes <= budget:
+        return cells, solution_counts, True, nodes
+    # Out of budget: estimate by random solutions
+    solution_counts = {}
+    for _ in range(samples):
+        nodes += backtracking(solution_counts, constraint_keys,
+                              constraint_values, cells, SAMPLE_NODES,
+                              rng or random, deadline)
+        if expired(deadline):
+            break
+    return cells, solution_counts, False, nodes
+
+
+def expired(deadline: float) -> bool:
+    # Whether time.perf_counter() has passed deadline (None for no deadline)
+    return deadline is not None and time.perf_counter() >= deadline
+
+
+def order_cells(constraint_keys: list) -> list:
+    # Order cells by breadth first search through constraints, so that
+    # cells sharing constraints are decided one after another
+    cells, visited = [], set()
+    touching = {}
+    for cell_set in constraint_keys:
+        for cell in cell_set:
+            touching.setdefault(cell, []).append(cell_set)
+    for cell_set in constraint_keys:
+        for start in sorted(cell_set - visited):
+            if start in visited:
+                continue
+            visited.add(start)
+            queue_index = len(cells)
+            cells.append(start)
+            while queue_index < len(cells):
+                cell = cells[queue_index]
+                queue_index += 1
+                for neighbors in touching[cell]:
+                    for neighbor in sorted(neighbors - visited):
+                        visited.add(neighbor)
+                        cells.append(neighbor)
+    return cells
+
+
+# Number of 1 bits of an int, int.bit_count needs Python 3.10
+popcount = int.bit_count if hasattr(int, 'bit_count') else \
+    lambda x: bin(x).count('1')
+
+
+def bits(x: int) -> list:
+    # Positions of 1 bits
+    positions = []
+    while x:
+        low = x & -x
+        positions.append(low.bit_length() - 1)
+        x ^= low
+    return positions
+
+
+def backtracking(solution_counts: dict, constraint_keys: list,
+                 constraint_values: list, cell_list: list,
+                 budget: int = None, rng: random.Random = None,
+                 deadline: float = None) -> int:
+    # Cell i is bit i, each constraint is a bitmask of its cells.
+    # State of search is 2 bitmasks: decided cells and mines, checking a
+    # constraint is counting bits of its mask & mines / undecided cells.
+    # Only constraints of cells just decided are checked, and cells of a
+    # constraint left with no choice are forced at once.
+    # budget: max number of search nodes, give up if exceeded
+    # rng: decide cells randomly and stop at the first solution (sampling)
+    # deadline: time.perf_counter() to give up at, checked every 256 nodes
+    # Return number of search nodes visited
+    count = len(cell_list)
+    full = (1 << count) - 1
+    index = {cell: i for i, cell in enumerate(cell_list)}
+    masks = [sum(1 << index[cell] for cell in cell_set) for cell_set in
+             constraint_keys]
+    touching = [[] for _ in range(count)]
+    for k, mask in enumerate(masks):
+        for i in bits(mask):
+            touching[i].append(k)
+
+    def propagate(decided: int, mines: int, constraints: list) -> tuple:
+        # Check given constraints, force cells without choice and check
+        # constraints of forced cells as well.
+        # Return new (decided, mines) or None if infeasible
+        pending = list(constraints)
+        while pending:
+            k = pending.pop()
+            undecided = masks[k] & ~decided
+            need = constraint_values[k] - popcount(masks[k] & mines)
+            free = popcount(undecided)
+            # Too many mines / too few cells left for mines
+            if need < 0 or need > free:
+                return None
+            # Remaining cells are all clean / all mines
+            if free > 0 and (need == 0 or need == free):
+                decided |= undecided
+                if need > 0:
+                    mines |= undecided
+                for i in bits(undecided):
+                    pending.extend(touching[i])
+        return decided, mines
+
+    def options(curr_index: int, decided: int, mines: int) -> list:
         # Search 2 possibilities: current cell is mine or not?
-        is_mine[curr_index] = True
-        if feasible(exact_match):
-            backtracking(all_solutions, constraint_keys, constraint_values,
-                         curr_index + 1,
-                         cell_list, is_mine)
-        is_mine[curr_index] = False
-        if feasible(exact_match):
-            backtracking(all_solutions, constraint_keys, constraint_values,
-                         curr_index + 1,
-                         cell_list, is_mine)
+        if rng is None:
+            return [True, False]
+        # Try mine first as often as constraints of the cell expect one
+        density = 0
+        for k in touching[curr_index]:
+            undecided = masks[k] & ~decided
+            need = constraint_values[k] - popcount(masks[k] & mines)
+            density += need / popcount(undecided)
+        if rng.random() < density / len(touching[curr_index]):
+            return [True, False]
+        return [False, True]
+
+    # Constraints without choice from the beginning
+    state = propagate(0, 0, range(len(masks)))
+    if state is None:
+        return 0
+    # Depth first search, stack of [cell index, state, options left]
+    stack, nodes = [], 0
+    while True:
+        decided, mines = state
+        # A feasible solution is generated: count it
+        if decided == full:
+            mine_bits = bits(mines)
+            if len(mine_bits) not in solution_counts:
+                solution_counts[len(mine_bits)] = [0, [0 for _ in
+                                                       range(count)]]
+            counts = solution_counts[len(mine_bits)]
+            counts[0] += 1
+            for i in mine_bits:
+                counts[1][i] += 1
+            if rng is not None:
+                return nodes
+        else:
+            nodes += 1
+            if budget is not None and nodes > budget:
+                return nodes
+            if nodes & 0xff == 0 and expired(deadline):
+                return nodes
+            # Cells are decided in order, first undecided one is next
+            undecided = full & ~decided
+            curr_index = (undecided & -undecided).bit_length() - 1
+            stack.append([curr_index, state, options(curr_index, *state)])
+        # Go on with next possibility of the deepest undecided cell
+        while stack:
+            curr_index, (decided, mines), left = stack[-1]
+            if not left:
+                stack.pop()
+                continue
+            cell = 1 << curr_index
+            state = propagate(decided | cell,
+                              mines | cell if left.pop(0) else mines,
+                              touching[curr_index])
+            if state is not None:
+                break
+        else:
+            return nodes
 
 
 def test():
     # Test codes
     keys = [{(1, 2), (2, 3), (3, 4)}, {(1, 2), (2, 3)}]
     values = [2, 1]
-    items, solutions = find_solutions(keys, values)
+    items, solution_counts, _, _ = find_solutions(keys, values)
     print(items)
-    for solution in solutions:
-        print(solution)
+    for mines, (count, cell_counts) in solution_counts.items():
+        print(mines, count, cell_counts)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,184 @@
+"""
+Table of local patterns: 5 x 5 windows of the board around frontier cells,
+mapped to cells that are clean / mines by the numbers inside the window.
+Windows equal up to rotation and reflection share an entry. The table is
+built offline from played games (`python -m auto.build_patterns`) and loaded
+once with all 8 orientations of each pattern, so finding deductions of a
+window is a single dict lookup.
+"""
+import os
+import gzip
+import json
+from auto.find_solutions import find_solutions
+from auto.reduce_constraints import reduce_constraints
+
+# Side of windows, and distance from the center to the edge
+SIZE, RADIUS = 5, 2
+PATTERN_FILE = os.path.join(os.path.dirname(__file__), 'patterns.json.gz')
+# Symbols of window cells besides numbers of mines left around inner
+# cells: unknown cells, and cells blocked from holding or counting
+# (known cells of the outer ring or without unknown neighbors,
+# marked cells and cells outside the board)
+UNKNOWN, BLOCKED = 'u', 'x'
+# Values of unknown / marked cells on board
+UNKNOWN_VALUE, MARKED_VALUE = -1, -2
+
+# Tables loaded: path -> PatternTable
+_tables = {}
+
+
+def symmetries() -> list:
+    # Index permutations of the window for 4 rotations x 2 reflections:
+    # cell i of a transformed window is cell perm[i] of the original
+    perms = []
+    for flip in (False, True):
+        for turns in range(4):
+            perm = []
+            for row in range(SIZE):
+                for col in range(SIZE):
+                    src_row, src_col = row, col
+                    for _ in range(turns):
+                        src_row, src_col = SIZE - 1 - src_col, src_row
+                    if flip:
+                        src_col = SIZE - 1 - src_col
+                    perm.append(src_row * SIZE + src_col)
+            perms.append(perm)
+    return perms
+
+
+SYMMETRIES = symmetries()
+
+
+def window(board: list, rows: int, cols: int, row: int, col: int,
+           neighbors: dict = None) -> str:
+    # Key of the window centered at [row, col] of a board of view values.
+    # neighbors: unknown / marked neighbors of frontier cells if known,
+    # otherwise they are counted on board
+    symbols = []
+    for ri in range(row - RADIUS, row + RADIUS + 1):
+        for ci in range(col - RADIUS, col + RADIUS + 1):
+            if not (0 <= ri < rows and 0 <= ci < cols):
+                symbols.append(BLOCKED)
+                continue
+            value = board[ri][ci]
+            if value == UNKNOWN_VALUE:
+                symbols.append(UNKNOWN)
+            elif value < 0 or abs(ri - row) == RADIUS or \
+                    abs(ci - col) == RADIUS:
+                symbols.append(BLOCKED)
+            elif neighbors is not None:
+                if (ri, ci) in neighbors:
+                    symbols.append(str(value - len(neighbors[ri, ci][1])))
+                else:
+                    symbols.append(BLOCKED)
+            else:
+                unknowns, marks = 0, 0
+                for rj in range(max(ri - 1, 0), min(rows, ri + 2)):
+                    for cj in range(max(ci - 1, 0), min(cols, ci + 2)):
+                        unknowns += board[rj][cj] == UNKNOWN_VALUE
+                        marks += board[rj][cj] == MARKED_VALUE
+                symbols.append(str(value - marks) if unknowns else BLOCKED)
+    return ''.join(symbols)
+
+
+def transform(key: str, perm: list) -> str:
+    return ''.join([key[index] for index in perm])
+
+
+def canonical(key: str) -> str:
+    # Smallest key among all orientations of a window
+    return min(transform(key, perm) for perm in SYMMETRIES)
+
+
+def window_constraints(key: str) -> tuple:
+    # Constraints of numbers in a window over indices of unknown cells
+    constraint_keys, constraint_values = [], []
+    for index, symbol in enumerate(key):
+        if symbol.isdigit():
+            row, col = divmod(index, SIZE)
+            constraint_keys.append({
+                ri * SIZE + ci for ri in range(row - 1, row + 2)
+                for ci in range(col - 1, col + 2)
+                if key[ri * SIZE + ci] == UNKNOWN})
+            constraint_values.append(int(symbol))
+    return constraint_keys, constraint_values
+
+
+def solve_window(key: str) -> tuple:
+    # Bit masks of clean / mine cells of a window implied by its numbers
+    constraint_keys, constraint_values = window_constraints(key)
+    if not constraint_keys:
+        return 0, 0
+    cells, solution_counts, _, _ = find_solutions(constraint_keys,
+                                                  constraint_values)
+    total = sum(counts[0] for counts in solution_counts.values())
+    clean, mines = 0, 0
+    if total == 0:
+        return clean, mines
+    for j, cell in enumerate(cells):
+        mine_count = sum(counts[1][j] for counts in solution_counts.values())
+        if mine_count == 0:
+            clean |= 1 << cell
+        elif mine_count == total:
+            mines |= 1 << cell
+    return clean, mines
+
+
+def beyond_reduction(key: str, clean: int, mines: int) -> bool:
+    # Whether a window implies cells that comparing pairs of its
+    # constraints does not, such windows are left to reduction inference
+    clean_cells, mine_cells, _, _ = reduce_constraints(
+        *window_constraints(key))
+    return sum(1 << cell for cell in clean_cells) != clean or \
+        sum(1 << cell for cell in mine_cells) != mines
+
+
+class PatternTable(object):
+    """Deductions of windows in all orientations, by window key."""
+
+    def __init__(self, patterns: list = ()):
+        # patterns: (key, clean mask, mine mask) of canonical windows
+        self.__data = {}
+        for key, clean, mines in patterns:
+            self.add(key, clean, mines)
+
+    def add(self, key: str, clean: int, mines: int):
+        for perm in SYMMETRIES:
+            self.__data[transform(key, perm)] = (
+                self.__permute_mask(clean, perm),
+                self.__permute_mask(mines, perm))
+
+    @staticmethod
+    def __permute_mask(mask: int, perm: list) -> int:
+        return sum(1 << index for index, source in enumerate(perm)
+                   if mask >> source & 1)
+
+    def lookup(self, key: str) -> tuple:
+        # Bit masks (clean, mines) of a window, None if not in table
+        return self.__data.get(key)
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+
+def mask_cells(mask: int, row: int, col: int) -> list:
+    # Cells of board in bit mask of the window centered at [row, col]
+    cells = []
+    while mask:
+        low = mask & -mask
+        index = low.bit_length() - 1
+        cells.append((row - RADIUS + index // SIZE,
+                      col - RADIUS + index % SIZE))
+        mask ^= low
+    return cells
+
+
+def load_table(path: str = PATTERN_FILE) -> PatternTable:
+    # Load table from file once, empty table if the file does not exist
+    if path not in _tables:
+        patterns = []
+        if os.path.exists(path):
+            with gzip.open(path, 'rt') as file:
+                patterns = json.load(file)['patterns']
+        _tables[path] = PatternTable(patterns)
+    return _tables[path]
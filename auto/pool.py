@@ -0,0 +1,25 @@
+"""
+Process pool shared by bots to solve large groups in parallel.
+Created on first use and reused across turns, games and bots.
+"""
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+
+_pool, _workers = None, 0
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    # Get shared pool with given number of worker processes
+    global _pool, _workers
+    if _pool is None or _workers != workers:
+        shutdown()
+        _pool, _workers = ProcessPoolExecutor(workers), workers
+    return _pool
+
+
+@atexit.register
+def shutdown():
+    global _pool, _workers
+    if _pool is not None:
+        _pool.shutdown()
+        _pool, _workers = None, 0
@@ -0,0 +1,111 @@
+"""
+Reduce a group of constraints by comparing pairs of them:
+if cells of one constraint are a subset of another's, the difference
+holds the difference of mines; overlapping constraints may also force
+their own cells. Repeat until nothing changes.
+"""
+from collections import deque
+
+# Stop deriving new constraints when there are this many,
+# given constraints are always kept
+MAX_CONSTRAINTS = 4096
+
+
+def reduce_constraints(constraint_keys: list,
+                       constraint_values: list) -> tuple:
+    # Return clean cells, mine cells and reduced constraints (keys, values)
+    constraints, index = {}, {}
+    # Decided cells: cell -> is mine, and cells not substituted yet
+    solved, pending = {}, []
+    queue = deque()
+    # Number of constraints derived from pairs so far
+    derived_count = 0
+
+    def solve(cell: tuple, mine: bool):
+        if cell not in solved:
+            solved[cell] = mine
+            pending.append(cell)
+
+    def add(cell_set: frozenset, value: int, derived: bool = True):
+        # Add constraint with decided cells removed,
+        # derived ones only while fewer than MAX_CONSTRAINTS were derived
+        nonlocal derived_count
+        value -= sum(solved[cell] for cell in cell_set if cell in solved)
+        cell_set = frozenset(cell for cell in cell_set if cell not in solved)
+        if not cell_set:
+            return
+        # All clean / all mines
+        if value == 0 or value == len(cell_set):
+            for cell in cell_set:
+                solve(cell, value > 0)
+        elif cell_set not in constraints and \
+                (not derived or derived_count < MAX_CONSTRAINTS):
+            derived_count += derived
+            constraints[cell_set] = value
+            for cell in cell_set:
+                index.setdefault(cell, set()).add(cell_set)
+            queue.append(cell_set)
+
+    def remove(cell_set: frozenset) -> int:
+        for cell in cell_set:
+            index[cell].discard(cell_set)
+        return constraints.pop(cell_set)
+
+    for cell_set, value in zip(constraint_keys, constraint_values):
+        add(frozenset(cell_set), value, False)
+    while pending or queue:
+        # Substitute decided cells in constraints containing them
+        while pending:
+            cell = pending.pop()
+            for cell_set in list(index.get(cell, ())):
+                add(cell_set, remove(cell_set), False)
+        if not queue:
+            break
+        first = queue.popleft()
+        if first not in constraints:
+            continue
+        # Compare with constraints having common cells
+        others = set()
+        for cell in first:
+            others.update(index[cell])
+        others.discard(first)
+        for second in others:
+            if first not in constraints:
+                break
+            if second not in constraints:
+                continue
+            first_value, second_value = constraints[first], constraints[second]
+            only_first, only_second = first - second, second - first
+            if not only_first:
+                # First is a subset of second
+                add(only_second, second_value - first_value)
+            elif not only_second:
+                add(only_first, first_value - second_value)
+            elif first_value - second_value == len(only_first):
+                # Mines of first outside second are as many as its cells
+                for cell in only_first:
+                    solve(cell, True)
+                for cell in only_second:
+                    solve(cell, False)
+            elif second_value - first_value == len(only_second):
+                for cell in only_second:
+                    solve(cell, True)
+                for cell in only_first:
+                    solve(cell, False)
+    clean_cells = [cell for cell, mine in solved.items() if not mine]
+    mine_cells = [cell for cell, mine in solved.items() if mine]
+    return clean_cells, mine_cells, [set(cell_set) for cell_set in
+                                     constraints], list(constraints.values())
+
+
+def test():
+    # Test codes: 1-2-1 pattern
+    keys = [{(1, 0), (1, 1)}, {(1, 0), (1, 1), (1, 2)},
+            {(1, 1), (1, 2), (1, 3)}, {(1, 2), (1, 3)}]
+    values = [1, 2, 2, 1]
+    clean_cells, mine_cells, keys, values = reduce_constraints(keys, values)
+    print(clean_cells, mine_cells, keys, values)
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,53 @@
+"""
+LRU cache of solutions for groups of constraints.
+A group is identified by its constraints regardless of their order,
+groups unchanged since last turn reuse their solutions.
+"""
+from collections import OrderedDict
+
+# Default number of groups kept in cache
+CACHE_SIZE = 1024
+
+
+def signature(constraint_keys: list, constraint_values: list) -> frozenset:
+    # Canonical key of a group: set of (cells, mines) constraints
+    return frozenset(zip(map(frozenset, constraint_keys), constraint_values))
+
+
+class SolutionCache(object):
+    """Least recently used cache of find_solutions results."""
+
+    def __init__(self, capacity: int = CACHE_SIZE):
+        self.capacity = capacity
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self.__data = OrderedDict()
+
+    def get(self, key: frozenset):
+        # Return cached result or None, count hit / miss
+        result = self.__data.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.__data.move_to_end(key)
+        return result
+
+    def put(self, key: frozenset, result: tuple):
+        self.__data[key] = result
+        self.__data.move_to_end(key)
+        while len(self.__data) > self.capacity:
+            self.__data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        # Drop cached results and reset stats
+        self.__data.clear()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def stats(self) -> dict:
+        return {'size': len(self.__data), 'capacity': self.capacity,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+    def __len__(self) -> int:
+        return len(self.__data)
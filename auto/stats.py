@@ -0,0 +1,67 @@
+"""
+Timings and counters of MineBot.analyze.
+Attach a `BotStats` to a bot to collect them, bots without one skip all
+bookkeeping.
+"""
+
+
+class BotStats(object):
+    """Per-strategy statistics of a bot, resettable."""
+
+    turns: int
+    # Strategy name -> number of calls / seconds spent / moves inferred
+    calls: dict
+    times: dict
+    moves: dict
+    # Number of cells in a group -> number of groups met
+    group_sizes: dict
+    # Groups solved (not found in cache) and their backtracking nodes
+    solved_groups: int
+    nodes: int
+    # Moves based on probability or random guess
+    guesses: int
+    # Turns that ran out of their deadline
+    timeouts: int
+
+    def __init__(self, callback=None):
+        # callback(turn: dict) is called at end of each analyze with
+        # strategies used in that turn: {name: [seconds, moves]}
+        self.callback = callback
+        self.__turn = {}
+        self.reset()
+
+    def reset(self):
+        self.turns = 0
+        self.calls, self.times, self.moves = {}, {}, {}
+        self.group_sizes = {}
+        self.solved_groups, self.nodes = 0, 0
+        self.guesses, self.timeouts = 0, 0
+
+    def record(self, name: str, seconds: float, moves: int):
+        # Record a call of strategy
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.times[name] = self.times.get(name, 0.) + seconds
+        self.moves[name] = self.moves.get(name, 0) + moves
+        self.__turn[name] = [seconds, moves]
+
+    def record_group(self, size: int, nodes: int = None):
+        # Record a group of cells, nodes is None if it is not solved
+        self.group_sizes[size] = self.group_sizes.get(size, 0) + 1
+        if nodes is not None:
+            self.solved_groups += 1
+            self.nodes += nodes
+
+    def end_turn(self, guesses: int, timed_out: bool = False):
+        self.turns += 1
+        self.guesses += guesses
+        self.timeouts += timed_out
+        if self.callback is not None:
+            self.callback(self.__turn)
+        self.__turn = {}
+
+    def summary(self) -> dict:
+        return {'turns': self.turns, 'calls': dict(self.calls),
+                'times': dict(self.times), 'moves': dict(self.moves),
+                'group_sizes': dict(sorted(self.group_sizes.items())),
+                'solved_groups': self.solved_groups, 'nodes': self.nodes,
+                'guesses': self.guesses, 'timeouts': self.timeouts}
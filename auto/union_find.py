@@ -6,11 +6,11 @@ Use union find to form disjoint groups from edges <i, j>.
 def union_find(edges: list, n: int) -> list:
     # Use union find to form disjoint groups
     def find_root(x: int) -> int:
-        if root_list[x] == x:
-            return x
-        else:
-            root_list[x] = find_root(root_list[x])
-            return root_list[x]
+        # Find root iteratively, halving the path on the way
+        while root_list[x] != x:
+            root_list[x] = root_list[root_list[x]]
+            x = root_list[x]
+        return x
 
     root_list = [i for i in range(n)]
     for p, q in edges:
@@ -19,13 +19,10 @@ def union_find(edges: list, n: int) -> list:
         # Join two relations
         if root_p != root_q:
             root_list[root_q] = root_p
-    # Compress root
-    for i in range(n):
-        find_root(i)
     # Form groups, each group has same roots
     group_dict = {}
     for i in range(n):
-        root = root_list[i]
+        root = find_root(i)
         if root not in group_dict:
             group_dict[root] = [i]
         else:
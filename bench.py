@@ -0,0 +1,244 @@
+"""
+Micro-benchmarks of solver and engine hot paths on checked-in corpora.
+Each benchmark reports its speed relative to a fixed reference workload
+and peak memory allocated by one pass over its corpus, compared with a
+saved baseline: results slower or allocating more than baseline by over a
+threshold are flagged.
+    python bench.py              # run, compare with baseline
+    python bench.py --save       # run, save results as baseline
+    python bench.py --capture    # capture corpora from seeded games again
+Baselines depend on the machine and are not checked in: save one before
+a change, then compare with it after.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+import auto.bot
+from game import MineGame, ArrayMineGame, STATUS, OPERATION
+from game.map import Map
+from auto import MineBot
+from auto.find_solutions import find_solutions
+from auto.union_find import union_find
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench')
+GROUPS_FILE = os.path.join(BENCH_DIR, 'groups.json.gz')
+EDGES_FILE = os.path.join(BENCH_DIR, 'edges.json.gz')
+BOARDS_FILE = os.path.join(BENCH_DIR, 'boards.json')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+# Flag results worse than baseline by this rate
+THRESHOLD = 0.2
+# Rounds timing each benchmark, the best one is reported, and CPU
+# seconds a round repeats passes over a corpus for at least
+ROUNDS, MIN_TIME = 10, 0.1
+# Games played to capture corpora: (shape, mines, games)
+CAPTURE_GAMES = [((16, 16), 40, 20), ((30, 16), 99, 20), ((40, 40), 320, 5)]
+# Items kept in each captured corpus
+CORPUS_SIZE = 300
+# Board shapes and densities: (rows, cols, mines)
+BOARDS = [(8, 8, 10), (16, 16, 40), (30, 16, 99), (40, 40, 160),
+          (40, 40, 320), (100, 100, 1500)]
+
+
+def capture(seed: int = 0):
+    # Play seeded games and record inputs of find_solutions / union_find
+    # called by the bot, then save a sample of them as corpora
+    groups, edges = [], []
+    solve, group = auto.bot.find_solutions, auto.bot.union_find
+
+    def record_solve(keys: list, values: list, **kwargs) -> tuple:
+        groups.append([[sorted(cell_set) for cell_set in keys],
+                       list(values)])
+        return solve(keys, values, **kwargs)
+
+    def record_group(edge_list: list, count: int) -> list:
+        if edge_list:
+            edges.append([edge_list, count])
+        return group(edge_list, count)
+
+    auto.bot.find_solutions, auto.bot.union_find = record_solve, record_group
+    try:
+        game = MineGame()
+        for shape, mines, games in CAPTURE_GAMES:
+            for index in range(games):
+                game.start(*shape, mines, seed=seed + index)
+                bot = MineBot(seed=seed + index)
+                while game.status == STATUS.RUNNING:
+                    game.move_many(bot.analyze(game))
+    finally:
+        auto.bot.find_solutions, auto.bot.union_find = solve, group
+    rng = random.Random(seed)
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    for path, corpus in [(GROUPS_FILE, groups), (EDGES_FILE, edges)]:
+        if len(corpus) > CORPUS_SIZE:
+            corpus = rng.sample(corpus, CORPUS_SIZE)
+        with gzip.open(path, 'wt') as file:
+            json.dump(corpus, file, separators=(',', ':'))
+    with open(BOARDS_FILE, 'w') as file:
+        json.dump([[rows, cols, mines, seed + index] for index, (
+            rows, cols, mines) in enumerate(BOARDS)], file)
+
+
+def load_corpora() -> tuple:
+    with gzip.open(GROUPS_FILE, 'rt') as file:
+        groups = [([set(map(tuple, cell_set)) for cell_set in keys], values)
+                  for keys, values in json.load(file)]
+    with gzip.open(EDGES_FILE, 'rt') as file:
+        edges = [([tuple(edge) for edge in edge_list], count)
+                 for edge_list, count in json.load(file)]
+    with open(BOARDS_FILE) as file:
+        boards = json.load(file)
+    return groups, edges, boards
+
+
+def clear_board(game_class, rows: int, cols: int, mines: int, seed: int):
+    # Uncover the center of a board, then all other clean cells at once
+    game = game_class()
+    game.start(rows, cols, mines, seed=seed)
+    game.move(OPERATION.UNCOVER, rows // 2, cols // 2)
+    if game.status == STATUS.RUNNING:
+        game.move_many([(OPERATION.UNCOVER, row, col) for row in range(rows)
+                        for col in range(cols) if game._map[row][col] != -1])
+
+
+def benchmarks(groups: list, edges: list, boards: list) -> dict:
+    # Name -> (function running one pass over corpus, operations in a pass)
+    def solve_groups():
+        for keys, values in groups:
+            find_solutions(keys, values, rng=random.Random(0))
+
+    def group_edges():
+        for edge_list, count in edges:
+            union_find(edge_list, count)
+
+    def init_maps(map_class):
+        def run():
+            for rows, cols, mines, seed in boards:
+                map_class(rows, cols, mines, random.Random(seed)).uncover(
+                    rows // 2, cols // 2)
+        return run
+
+    def clear_boards(game_class):
+        def run():
+            for rows, cols, mines, seed in boards:
+                clear_board(game_class, rows, cols, mines, seed)
+        return run
+
+    suite = {'find_solutions': (solve_groups, len(groups)),
+             'union_find': (group_edges, len(edges)),
+             'map_init': (init_maps(Map), len(boards)),
+             'uncover': (clear_boards(MineGame), len(boards))}
+    if ArrayMineGame is not None:
+        from game.array_game import ArrayMap
+        suite['array_map_init'] = (init_maps(ArrayMap), len(boards))
+        suite['array_uncover'] = (clear_boards(ArrayMineGame), len(boards))
+    return suite
+
+
+def reference():
+    # Fixed pure Python work, its speed stands for the speed of the machine
+    total = 0
+    for i in range(10000):
+        total += i * i % 7
+    return total
+
+
+def measure(suite: dict, rounds: int = ROUNDS,
+            min_time: float = MIN_TIME) -> dict:
+    # Name -> best speed over rounds relative to the best speed of the
+    # reference work, and peak memory of a pass. Each round times the
+    # reference and every benchmark for min_time CPU seconds, so rounds
+    # are spread over the whole run: load of other processes only slows
+    # some of them, and a machine slower for the whole run cancels out
+    suite = dict(suite, reference=(reference, 1))
+    best = {name: 0. for name in suite}
+    for run, _ in suite.values():
+        run()
+    for _ in range(rounds):
+        for name, (run, ops) in suite.items():
+            passes, start = 0, time.process_time()
+            while True:
+                run()
+                passes += 1
+                elapsed = time.process_time() - start
+                if elapsed >= min_time:
+                    break
+            best[name] = max(best[name], passes * ops / elapsed)
+    results = {}
+    for name, (run, _) in suite.items():
+        if name == 'reference':
+            continue
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {'relative_speed': best[name] / best['reference'],
+                         'peak_kib': peak / 1024}
+    return results
+
+
+def compare(result: dict, base: dict, threshold: float) -> list:
+    # Names of metrics worse than baseline by over threshold
+    flags = []
+    if result['relative_speed'] < base['relative_speed'] * (1 - threshold):
+        flags.append('slower')
+    if result['peak_kib'] > base['peak_kib'] * (1 + threshold):
+        flags.append('allocates more')
+    return flags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--save', action='store_true',
+                        help='save results as baseline')
+    parser.add_argument('--capture', action='store_true',
+                        help='capture corpora from seeded games first')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--only', nargs='*', help='benchmarks to run')
+    args = parser.parse_args()
+    if args.capture:
+        capture()
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as file:
+            baseline = json.load(file)['results']
+    elif not args.save:
+        print('No baseline yet, run with --save to create one',
+              file=sys.stderr)
+    suite = {name: item for name, item in benchmarks(
+        *load_corpora()).items() if not args.only or name in args.only}
+    results, flagged = measure(suite), []
+    print('{:<16}{:>14}{:>12}{:>10}'.format('benchmark', 'speed',
+                                           'peak KiB', 'change'))
+    for name, result in results.items():
+        change, flags = '', []
+        # Baselines saved in another format are ignored
+        if 'relative_speed' in baseline.get(name, {}):
+            change = '{:+.1%}'.format(result['relative_speed'] /
+                                      baseline[name]['relative_speed'] - 1)
+            flags = compare(result, baseline[name], args.threshold)
+        print('{:<16}{:>14.4f}{:>12.1f}{:>10}  {}'.format(
+            name, result['relative_speed'], result['peak_kib'], change,
+            ', '.join(flags)))
+        if flags:
+            flagged.append(name)
+    if args.save:
+        with open(BASELINE_FILE, 'w') as file:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'results': dict(baseline, **results)},
+                      file, indent=2)
+    if flagged and not args.save:
+        print('Regressions over {:.0%}: {}'.format(args.threshold,
+                                                   ', '.join(flagged)),
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,8 @@
 from game.game import MineGame, STATUS, MASK, OPERATION
+from game.chunked_game import ChunkedMineGame
+
+try:
+    from game.array_game import ArrayMineGame
+    from game.batch_game import BatchMineGame
+except ImportError:  # numpy is not installed
+    ArrayMineGame = BatchMineGame = None
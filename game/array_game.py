@@ -0,0 +1,182 @@
+"""
+Mine-sweeper map and game backed by numpy arrays.
+Same interface as `Map` and `MineGame`, much cheaper for large boards.
+"""
+import random
+import numpy as np
+from game.game import MineGame, MASK, STATES, CODES
+from game.map import place_mines
+from game.neighbors import count_around, dilate
+
+
+class ArrayMap(object):
+    """Map of mine sweeper game stored in an int8 array."""
+
+    def __init__(self, rows: int, columns: int, total: int,
+                 rng: random.Random = None, safe_area: bool = False):
+        self.__cols = columns
+        self.__rows = rows
+        self.__total = total
+        self.__rng = rng
+        self.__safe_area = safe_area
+        self.__data = np.zeros((rows, columns), dtype=np.int8)
+        self.__flag = True
+        # Labels of connected zero regions and their bounding boxes
+        self.__labels, self.__boxes = None, None
+
+    def uncover(self, row: int, col: int) -> int:
+        if self.__flag:
+            self.__init_map(row, col)
+            self.__flag = False
+        return self.__data[row, col]
+
+    def __init_map(self, row: int, col: int):
+        # Initialize mines at first attempt to avoid collision
+        positions = place_mines(self.__rows, self.__cols, self.__total, row,
+                                col, self.__rng, self.__safe_area)
+        self.place(positions)
+
+    def place(self, positions: list):
+        # Place mines at given positions (row * columns + col) instead of
+        # sampling them at first uncover, e.g., to restore a recorded game
+        self.__flag = False
+        self.__labels, self.__boxes = None, None
+        mines = np.zeros(self.__rows * self.__cols, dtype=bool)
+        mines[positions] = True
+        mines = mines.reshape(self.__rows, self.__cols)
+        counts = count_around(mines)
+        counts[mines] = -1
+        self.__data = counts
+
+    def zero_region(self, row: int, col: int) -> tuple:
+        # Find the zero region containing zero cell [row, col]
+        # Return (top, left, region): region is a bool array covering
+        # the bounding box of the region extended by 1 cell
+        if self.__labels is None:
+            self.__label_regions()
+        label = self.__labels[row, col]
+        top, bottom, left, right = self.__boxes[label]
+        top, left = max(top - 1, 0), max(left - 1, 0)
+        bottom, right = bottom + 2, right + 2
+        region = self.__labels[top:bottom, left:right] == label
+        return top, left, region
+
+    def __label_regions(self):
+        # Label connected (8 directions) zero regions of the whole map,
+        # map never changes after initialized so it is done only once
+        rows, cols = self.__rows, self.__cols
+        # Extract runs of zeros in each row: [start, end]
+        padded = np.zeros((rows, cols + 2), dtype=np.int8)
+        padded[:, 1:-1] = self.__data == 0
+        step = np.diff(padded, axis=1)
+        run_rows, starts = np.nonzero(step == 1)
+        ends = np.nonzero(step == -1)[1] - 1
+        count = len(starts)
+        # Runs in adjacent rows that touch each other are connected:
+        # for each run find the range [low, high) of such runs in next row
+        width = cols + 2
+        start_keys = run_rows * width + starts
+        end_keys = run_rows * width + ends
+        next_row = (run_rows + 1) * width
+        low = np.searchsorted(end_keys, next_row + starts - 1, 'left')
+        high = np.searchsorted(start_keys, next_row + ends + 1, 'right')
+        edge_counts = np.maximum(high - low, 0)
+        total = int(edge_counts.sum())
+        offsets = np.arange(total) - np.repeat(
+            np.cumsum(edge_counts) - edge_counts, edge_counts)
+        first = np.repeat(np.arange(count), edge_counts)
+        second = np.repeat(low, edge_counts) + offsets
+        # Propagate minimum label through edges until stable
+        labels = np.arange(count)
+        while True:
+            previous = labels.copy()
+            np.minimum.at(labels, first, labels[second])
+            np.minimum.at(labels, second, labels[first])
+            # Shortcut label chains
+            jumped = labels[labels]
+            while not np.array_equal(jumped, labels):
+                labels, jumped = jumped, jumped[jumped]
+            if np.array_equal(previous, labels):
+                break
+        # Paint labels of runs onto cells
+        lengths = ends - starts + 1
+        cell_offsets = np.arange(int(lengths.sum())) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths)
+        cells = np.repeat(run_rows * cols + starts, lengths) + cell_offsets
+        self.__labels = np.full(rows * cols, -1, dtype=np.int32)
+        self.__labels[cells] = np.repeat(labels, lengths)
+        self.__labels = self.__labels.reshape(rows, cols)
+        # Bounding box of each region: top, bottom, left, right
+        self.__boxes = np.empty((count, 4), dtype=np.int64)
+        self.__boxes[:, 0::2] = rows + cols
+        self.__boxes[:, 1::2] = -1
+        np.minimum.at(self.__boxes[:, 0], labels, run_rows)
+        np.maximum.at(self.__boxes[:, 1], labels, run_rows)
+        np.minimum.at(self.__boxes[:, 2], labels, starts)
+        np.maximum.at(self.__boxes[:, 3], labels, ends)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        # Access data: [i][j]
+        return self.__data[index]
+
+
+class ArrayMineGame(MineGame):
+    """Mine sweeper game object storing map and mask in numpy arrays."""
+
+    # Grids uncovered in bulk, added to change log lazily
+    __changes, __pending = None, ()
+
+    @property
+    def changes(self) -> list:
+        # Log of cells whose visible state changed, in order of change
+        if self.__pending:
+            for rows, cols in self.__pending:
+                self.__changes.extend(zip(rows.tolist(), cols.tolist()))
+            self.__pending = []
+        return self.__changes
+
+    @changes.setter
+    def changes(self, changes: list):
+        self.__changes, self.__pending = changes, []
+
+    def _new_board(self, rows: int, columns: int, mines: int,
+                   rng: random.Random = None,
+                   safe_area: bool = False) -> tuple:
+        mask = np.full((rows, columns), CODES[MASK.UNKNOWN], dtype=np.uint8)
+        visible = np.full(rows * columns, MASK.UNKNOWN.value, dtype=np.int8)
+        return ArrayMap(rows, columns, mines, rng, safe_area), mask, visible
+
+    def _state(self, row: int, col: int) -> MASK:
+        return STATES[self._mask[row, col]]
+
+    def _set_state(self, row: int, col: int, state: MASK):
+        self._mask[row, col] = CODES[state]
+        self._visible[row * self.cols + col] = \
+            self._map[row][col] if state == MASK.KNOWN else state.value
+
+    @property
+    def board(self) -> np.ndarray:
+        # Read-only rows x cols view of visible values of all cells
+        board = self._visible.reshape(self.rows, self.cols)
+        board.flags.writeable = False
+        return board
+
+    def _flood(self, row: int, col: int):
+        # Uncover the zero region of [row, col] with its border at once
+        top, left, region = self._map.zero_region(row, col)
+        height, width = region.shape
+        window = self._mask[top:top + height, left:left + width]
+        # Flood fill stops at marked / known cells: if region has any
+        # (except [row, col] itself), expand it cell by cell instead
+        if np.count_nonzero(window[region] != CODES[MASK.UNKNOWN]) > 1:
+            super()._flood(row, col)
+            return
+        uncovered = dilate(region) & (window == CODES[MASK.UNKNOWN])
+        window[uncovered] = CODES[MASK.KNOWN]
+        visible = self._visible.reshape(self.rows, self.cols)[
+            top:top + height, left:left + width]
+        visible[uncovered] = self._map[top:top + height][
+            :, left:left + width][uncovered]
+        self.remain -= int(np.count_nonzero(uncovered))
+        rows, cols = np.nonzero(uncovered)
+        self.__pending.append((rows + top, cols + left))
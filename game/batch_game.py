@@ -0,0 +1,114 @@
+"""
+Mine-sweeper games played in lockstep: N boards of the same shape are
+stored in stacked numpy arrays, one move per game is applied per call.
+Rules are the same as `MineGame`.
+"""
+import numpy as np
+from game.game import STATUS, MASK, OPERATION, CODES
+from game.neighbors import count_around, dilate
+
+UNKNOWN, KNOWN, MARKED = (CODES[MASK.UNKNOWN], CODES[MASK.KNOWN],
+                          CODES[MASK.MARKED])
+
+
+class BatchMineGame(object):
+    """N mine sweeper games of the same shape played together."""
+
+    size, rows, cols, mines = 0, 0, 0, 0
+    # Arrays of each game: status (STATUS values), remain, marked, moves
+    status, remain, marked, moves = None, None, None, None
+    __data, __mask, __ready, __rng = None, None, None, None
+
+    def start(self, size: int, rows: int, columns: int, mines: int,
+              seed=None):
+        # seed: seed of numpy random generator for all games
+        assert size > 0 and columns > 0 and rows > 0
+        assert 0 < mines < rows * columns
+        self.size, self.rows, self.cols, self.mines = size, rows, columns, \
+            mines
+        self.status = np.full(size, STATUS.RUNNING.value, dtype=np.int8)
+        self.remain = np.full(size, rows * columns, dtype=np.int64)
+        self.marked = np.zeros(size, dtype=np.int64)
+        self.moves = np.zeros(size, dtype=np.int64)
+        self.__data = np.zeros((size, rows, columns), dtype=np.int8)
+        self.__mask = np.full((size, rows, columns), UNKNOWN, dtype=np.uint8)
+        # Whether mines of each game are placed
+        self.__ready = np.zeros(size, dtype=bool)
+        self.__rng = np.random.default_rng(seed)
+
+    def view(self) -> np.ndarray:
+        # Observations of all games: same values as `MineGame.view`
+        return np.where(self.__mask == KNOWN, self.__data,
+                        np.where(self.__mask == MARKED, MASK.MARKED.value,
+                                 MASK.UNKNOWN.value)).astype(np.int8)
+
+    def move(self, operations, rows, cols) -> tuple:
+        # Apply one move to each game: arrays of OPERATION values (0 for
+        # no move), rows and columns. Finished games are left unchanged.
+        # Return observations and status of all games
+        operations = np.asarray(operations)
+        rows, cols = np.asarray(rows), np.asarray(cols)
+        assert operations.shape == rows.shape == cols.shape == (self.size,)
+        active = (operations != 0) & (self.status == STATUS.RUNNING.value)
+        assert np.all((0 <= rows[active]) & (rows[active] < self.rows))
+        assert np.all((0 <= cols[active]) & (cols[active] < self.cols))
+        self.moves += active
+        games = np.arange(self.size)
+        # Mark / unmark
+        marking = active & (operations == OPERATION.MARK.value)
+        state = self.__mask[games, rows, cols]
+        to_mark = marking & (state == UNKNOWN)
+        to_unmark = marking & (state == MARKED)
+        self.__mask[games[to_mark], rows[to_mark], cols[to_mark]] = MARKED
+        self.__mask[games[to_unmark], rows[to_unmark], cols[to_unmark]] = \
+            UNKNOWN
+        self.marked += to_mark
+        self.marked -= to_unmark
+        # Uncover
+        uncovering = active & (operations == OPERATION.UNCOVER.value) & \
+            (state == UNKNOWN)
+        self.__place_mines(uncovering & ~self.__ready, rows, cols)
+        opened = np.zeros_like(self.__data, dtype=bool)
+        opened[games[uncovering], rows[uncovering], cols[uncovering]] = True
+        self.__uncover(opened)
+        value = self.__data[games, rows, cols]
+        lose = uncovering & (value == -1)
+        self.status[lose] = STATUS.LOSE.value
+        win = (self.status == STATUS.RUNNING.value) & \
+            (self.remain == self.mines)
+        self.status[win] = STATUS.WIN.value
+        return self.view(), self.status.copy()
+
+    def __place_mines(self, games: np.ndarray, rows: np.ndarray,
+                      cols: np.ndarray):
+        # Place mines of games at their first uncover, avoiding that cell
+        games = np.flatnonzero(games)
+        if len(games) == 0:
+            return
+        cells = self.rows * self.cols
+        keys = self.__rng.random((len(games), cells))
+        keys[np.arange(len(games)), rows[games] * self.cols + cols[games]] = 2.
+        positions = np.argpartition(keys, self.mines - 1, axis=1)[:,
+                                                                  :self.mines]
+        mines = np.zeros((len(games), cells), dtype=bool)
+        np.put_along_axis(mines, positions, True, axis=1)
+        mines = mines.reshape(len(games), self.rows, self.cols)
+        counts = count_around(mines)
+        counts[mines] = -1
+        self.__data[games] = counts
+        self.__ready[games] = True
+
+    def __uncover(self, opened: np.ndarray):
+        # Uncover given cells, then expand zero regions layer by layer,
+        # only games still expanding are processed
+        games = np.flatnonzero(opened.any(axis=(1, 2)))
+        opened = opened[games]
+        while len(games):
+            mask = self.__mask[games]
+            mask[opened] = KNOWN
+            self.__mask[games] = mask
+            self.remain[games] -= opened.sum(axis=(1, 2))
+            zero = self.__data[games] == 0
+            opened = dilate(opened & zero) & (mask == UNKNOWN)
+            expanding = opened.any(axis=(1, 2))
+            games, opened = games[expanding], opened[expanding]
@@ -0,0 +1,186 @@
+"""
+Mine-sweeper map and game split into square chunks generated lazily.
+Mines of a chunk are sampled on first touch from a generator seeded by
+(seed, chunk coordinate), so memory is spent only on the explored region
+and its surroundings. Same interface as `Map` and `MineGame`, except that
+there is no dense `board` view: windows of the board are read by `region`.
+"""
+import random
+from array import array
+from game.game import MineGame, MASK, STATES, CODES
+from game.map import sample_positions
+
+# Side of a chunk
+CHUNK = 64
+
+
+class ChunkedMap(object):
+    """Map of mine sweeper game generated chunk by chunk."""
+
+    def __init__(self, rows: int, columns: int, total: int,
+                 rng: random.Random = None, safe_area: bool = False,
+                 chunk: int = CHUNK):
+        # Mines are spread with density total / (rows * columns), each chunk
+        # holds a fixed number of them given its size, so `total` is the
+        # sum of them, which may differ from the requested one by rounding
+        self.__cols = columns
+        self.__rows = rows
+        self.__chunk = chunk
+        self.__density = total / (rows * columns)
+        self.__safe_area = safe_area
+        self.__seed = (rng or random).getrandbits(64)
+        # Cells no mine is placed on, decided at first uncover
+        self.__excluded = None
+        # Chunk coordinate -> positions of mines in chunk / values of cells
+        self.__mines, self.__values = {}, {}
+        self.total = self.__count_total()
+
+    def __shape(self, chunk_row: int, chunk_col: int) -> tuple:
+        # Top, left, height and width of a chunk
+        top, left = chunk_row * self.__chunk, chunk_col * self.__chunk
+        return (top, left, min(self.__chunk, self.__rows - top),
+                min(self.__chunk, self.__cols - left))
+
+    def __chunk_mines(self, height: int, width: int) -> int:
+        # Number of mines of a chunk, leaving room for the first cell and
+        # its neighbors
+        area = height * width
+        return max(0, min(round(self.__density * area), area - 9))
+
+    def __count_total(self) -> int:
+        # Sum of mines of all chunks: chunks are full-sized except the
+        # last row / column of them
+        heights = [(self.__chunk, self.__rows // self.__chunk),
+                   (self.__rows % self.__chunk, 1)]
+        widths = [(self.__chunk, self.__cols // self.__chunk),
+                  (self.__cols % self.__chunk, 1)]
+        return sum(self.__chunk_mines(height, width) * rows * cols
+                   for height, rows in heights for width, cols in widths)
+
+    def uncover(self, row: int, col: int) -> int:
+        if self.__excluded is None:
+            # Keep the first cell (and its neighbors if safe_area) clean
+            self.__excluded = {(row, col)}
+            if self.__safe_area:
+                rows = range(max(0, row - 1), min(self.__rows, row + 2))
+                cols = range(max(0, col - 1), min(self.__cols, col + 2))
+                self.__excluded = {(ri, ci) for ri in rows for ci in cols}
+        return self.value(row, col)
+
+    def value(self, row: int, col: int) -> int:
+        # Number of mines around [row, col], -1 for a mine
+        chunk_row, chunk_col = row // self.__chunk, col // self.__chunk
+        values = self.__values.get((chunk_row, chunk_col))
+        if values is None:
+            values = self.__init_values(chunk_row, chunk_col)
+        top, left, _, width = self.__shape(chunk_row, chunk_col)
+        return values[(row - top) * width + col - left]
+
+    def __get_mines(self, chunk_row: int, chunk_col: int) -> array:
+        # Sample mines of a chunk on first touch, kept as positions in it
+        mines = self.__mines.get((chunk_row, chunk_col))
+        if mines is None:
+            top, left, height, width = self.__shape(chunk_row, chunk_col)
+            excluded = [(row - top) * width + col - left
+                        for row, col in self.__excluded or ()
+                        if top <= row < top + height and
+                        left <= col < left + width]
+            # Seeded by a string, so it does not depend on hash seed
+            rng = random.Random('{}:{}:{}'.format(self.__seed, chunk_row,
+                                                  chunk_col))
+            mines = array('I', sample_positions(height * width,
+                                                self.__chunk_mines(
+                                                    height, width),
+                                                excluded, rng))
+            self.__mines[chunk_row, chunk_col] = mines
+        return mines
+
+    def __init_values(self, chunk_row: int, chunk_col: int) -> array:
+        # Count mines around cells of a chunk, mines of neighboring chunks
+        # are generated as well
+        top, left, height, width = self.__shape(chunk_row, chunk_col)
+        values = array('b', bytes(height * width))
+        for pos in self.__get_mines(chunk_row, chunk_col):
+            values[pos] = -1
+        for ri in range(chunk_row - 1, chunk_row + 2):
+            for ci in range(chunk_col - 1, chunk_col + 2):
+                if ri < 0 or ci < 0 or ri * self.__chunk >= self.__rows or \
+                        ci * self.__chunk >= self.__cols:
+                    continue
+                other_top, other_left, _, other_width = self.__shape(ri, ci)
+                for pos in self.__get_mines(ri, ci):
+                    row = other_top + pos // other_width
+                    col = other_left + pos % other_width
+                    for rj in range(max(row - 1, top),
+                                    min(row + 2, top + height)):
+                        for cj in range(max(col - 1, left),
+                                        min(col + 2, left + width)):
+                            index = (rj - top) * width + cj - left
+                            if values[index] != -1:
+                                values[index] += 1
+        self.__values[chunk_row, chunk_col] = values
+        return values
+
+    def chunks(self) -> int:
+        # Number of chunks generated so far
+        return len(self.__mines)
+
+    def __getitem__(self, row: int):
+        # Access data: [i][j]
+        return ChunkedRow(self, row)
+
+
+class ChunkedRow(object):
+    """A row of a chunked map, indexed by column."""
+    __slots__ = ('__map', '__row')
+
+    def __init__(self, chunked_map: ChunkedMap, row: int):
+        self.__map, self.__row = chunked_map, row
+
+    def __getitem__(self, col: int) -> int:
+        return self.__map.value(self.__row, col)
+
+
+class ChunkedMineGame(MineGame):
+    """Mine sweeper game on a chunked map with mask kept per chunk."""
+    # No dense view of the whole board, read windows with region()
+    board = None
+
+    def start(self, rows: int, columns: int, mines: int, seed=None,
+              safe_area: bool = False):
+        super().start(rows, columns, mines, seed, safe_area)
+        # Actual number of mines, after rounding per chunk
+        self.mines = self._map.total
+
+    def _new_board(self, rows: int, columns: int, mines: int,
+                   rng: random.Random = None,
+                   safe_area: bool = False) -> tuple:
+        # Mask: chunk coordinate -> codes of cells, for touched chunks only
+        return ChunkedMap(rows, columns, mines, rng, safe_area), {}, None
+
+    def _state(self, row: int, col: int) -> MASK:
+        codes = self._mask.get((row // CHUNK, col // CHUNK))
+        if codes is None:
+            return MASK.UNKNOWN
+        return STATES[codes[row % CHUNK * CHUNK + col % CHUNK]]
+
+    def _set_state(self, row: int, col: int, state: MASK):
+        key = row // CHUNK, col // CHUNK
+        if key not in self._mask:
+            self._mask[key] = bytearray(CHUNK * CHUNK)
+        self._mask[key][row % CHUNK * CHUNK + col % CHUNK] = CODES[state]
+
+    def view(self, row: int, col: int) -> int:
+        # See the cell at [row, col]
+        assert 0 <= col < self.cols and 0 <= row < self.rows
+        state = self._state(row, col)
+        if state == MASK.KNOWN:
+            return self._map.value(row, col)
+        return state.value
+
+    def region(self, top: int, left: int, height: int, width: int) -> list:
+        # Visible values of cells in a window of the board, as lists of rows
+        assert 0 <= top and 0 <= left and height >= 0 and width >= 0 and \
+            top + height <= self.rows and left + width <= self.cols
+        return [[self.view(row, col) for col in range(left, left + width)]
+                for row in range(top, top + height)]
@@ -2,8 +2,9 @@
 Mine-sweeper game class.
 """
 import time
+import random
+from array import array
 from enum import Enum
-from termcolor import colored
 from game.map import Map
 
 
@@ -21,6 +22,11 @@ class MASK(Enum):
     KNOWN = 0
 
 
+# Mask states stored as small int codes by compact engines and records
+STATES = (MASK.UNKNOWN, MASK.KNOWN, MASK.MARKED)
+CODES = {state: code for code, state in enumerate(STATES)}
+
+
 class OPERATION(Enum):
     """Operation of player: uncover and mark."""
     UNCOVER = 1
@@ -33,74 +39,153 @@ class MineGame(object):
     rows, cols, mines, marked, remain, moves = 0, 0, 0, 0, 0, 0
     status = STATUS.WIN
     start_time, __duration = 0., 0.
-    __map, __mask = None, None
-
-    def start(self, rows: int, columns: int, mines: int):
+    # Seed of mine placement, None for unseeded games
+    seed = None
+    _map, _mask = None, None
+    # Visible value of each cell in row-major order, as returned by view
+    _visible = None
+    # Log of cells whose visible state changed, in order of change
+    changes = None
+    # Moves made so far: (operation, row, col)
+    history = None
+
+    def start(self, rows: int, columns: int, mines: int, seed=None,
+              safe_area: bool = False):
+        # seed: int or random.Random used to place mines,
+        # global random state is used by default
+        # safe_area: keep neighbors of first uncovered grid free of mines
         assert columns > 0 and rows > 0 and 0 < mines < rows * columns
         # Initialize game data
         self.rows, self.cols, self.mines = rows, columns, mines
+        if isinstance(seed, random.Random):
+            self.seed, rng = None, seed
+        else:
+            self.seed = seed
+            rng = None if seed is None else random.Random(seed)
         self.remain = rows * columns
         self.marked, self.moves, self.status = 0, 0, STATUS.RUNNING
         self.start_time, self.__duration = time.time(), 0.
-        self.__map = Map(rows, columns, self.mines)
-        self.__mask = [[MASK.UNKNOWN for _ in range(columns)] for _ in
-                       range(rows)]
+        self.changes, self.history = [], []
+        self._map, self._mask, self._visible = self._new_board(
+            rows, columns, mines, rng, safe_area)
+
+    def _new_board(self, rows: int, columns: int, mines: int,
+                   rng: random.Random = None,
+                   safe_area: bool = False) -> tuple:
+        # Create map, mask and visible values of a new game
+        mask = [[MASK.UNKNOWN for _ in range(columns)] for _ in range(rows)]
+        visible = array('b', [MASK.UNKNOWN.value]) * (rows * columns)
+        return Map(rows, columns, mines, rng, safe_area), mask, visible
+
+    def _state(self, row: int, col: int) -> MASK:
+        # Mask of the cell at [row, col]
+        return self._mask[row][col]
+
+    def _set_state(self, row: int, col: int, state: MASK):
+        self._mask[row][col] = state
+        self._visible[row * self.cols + col] = \
+            self._map[row][col] if state == MASK.KNOWN else state.value
 
     def view(self, row: int, col: int) -> int:
         # See the cell at [row, col]
         assert 0 <= col < self.cols and 0 <= row < self.rows
-        if self.__mask[row][col] == MASK.KNOWN:
-            value = self.__map[row][col]
-        else:
-            value = self.__mask[row][col].value
-        return value
+        return int(self._visible[row * self.cols + col])
+
+    @property
+    def board(self):
+        # Read-only rows x cols view of visible values of all cells, shares
+        # memory with the game so it follows moves until next start
+        return memoryview(self._visible).cast(
+            'b', (self.rows, self.cols)).toreadonly()
+
+    def region(self, top: int, left: int, height: int, width: int) -> list:
+        # Visible values of cells in a window of the board, as lists of rows
+        assert 0 <= top and 0 <= left and height >= 0 and width >= 0 and \
+            top + height <= self.rows and left + width <= self.cols
+        return [self._visible[row * self.cols + left:
+                              row * self.cols + left + width].tolist()
+                for row in range(top, top + height)]
 
     def move(self, operation: OPERATION, row: int, col: int):
         assert self.status == STATUS.RUNNING
-        assert 0 <= col < self.cols and 0 <= row < self.rows
-        self.moves += 1
-        # Operations: uncover and mark / unmark
-        do = {OPERATION.UNCOVER: self.__uncover,
-              OPERATION.MARK: self.__mark}[operation]
-        # Perform operation
-        if self.__mask[row][col] != MASK.KNOWN:
-            value = do(row, col)
-        else:
-            value = self.__map[row][col]
+        value = self.__apply(operation, row, col)
         if self.status != STATUS.RUNNING:
             self.__end_game()
         return value
 
+    def move_many(self, moves) -> dict:
+        # Apply moves (operation, row, col) in order until game is over,
+        # moves can be a list or an array, operation an OPERATION or its value
+        # Return outcome: status, values of applied moves, number of
+        # uncovered cells and index of losing move (None if not lost)
+        assert self.status == STATUS.RUNNING
+        remain, values, lose = self.remain, [], None
+        for index, (operation, row, col) in enumerate(moves):
+            values.append(self.__apply(OPERATION(operation), int(row),
+                                       int(col)))
+            if self.status != STATUS.RUNNING:
+                if self.status == STATUS.LOSE:
+                    lose = index
+                self.__end_game()
+                break
+        return {'status': self.status, 'values': values,
+                'revealed': remain - self.remain, 'lose': lose}
+
+    def __apply(self, operation: OPERATION, row: int, col: int) -> int:
+        # Perform a move of running game
+        assert 0 <= col < self.cols and 0 <= row < self.rows
+        self.moves += 1
+        self.history.append((operation, row, col))
+        if self._state(row, col) == MASK.KNOWN:
+            return int(self._map[row][col])
+        # Operations: uncover and mark / unmark
+        if operation == OPERATION.UNCOVER:
+            return self.__uncover(row, col)
+        return self.__mark(row, col)
+
     def __uncover(self, row: int, col: int) -> int:
         # Uncover grid
-        direct = [[1, 0], [-1, 0], [0, 1], [0, -1],
-                  [-1, -1], [1, 1], [-1, 1], [1, -1]]
-        value = self.__map.uncover(row, col)
-        if self.__mask[row][col] == MASK.UNKNOWN:  # New grid
-            self.__mask[row][col] = MASK.KNOWN
+        value = int(self._map.uncover(row, col))
+        if self._state(row, col) == MASK.UNKNOWN:  # New grid
+            self._set_state(row, col, MASK.KNOWN)
+            self.changes.append((row, col))
             self.remain -= 1
             if value == -1:
                 self.status = STATUS.LOSE
-            elif self.remain == self.mines:
-                self.status = STATUS.WIN
+                return value
             elif value == 0:
-                # Recursively uncover neighborhood grids
-                for dr, dc in direct:
-                    new_r = row + dr
-                    new_c = col + dc
-                    if 0 <= new_c < self.cols:
-                        if 0 <= new_r < self.rows:
-                            if self.__mask[new_r][new_c] == MASK.UNKNOWN:
-                                self.__uncover(new_r, new_c)
+                # Uncover the whole zero region and its border
+                self._flood(row, col)
+            if self.remain == self.mines:
+                self.status = STATUS.WIN
         return value
 
+    def _flood(self, row: int, col: int):
+        # Uncover neighborhood of zero grid [row, col] iteratively,
+        # zero grids found on the way are expanded as well
+        stack, uncovered = [(row, col)], 0
+        while stack:
+            row, col = stack.pop()
+            for ri in range(max(row - 1, 0), min(self.rows, row + 2)):
+                for ci in range(max(col - 1, 0), min(self.cols, col + 2)):
+                    if self._state(ri, ci) == MASK.UNKNOWN:
+                        self._set_state(ri, ci, MASK.KNOWN)
+                        self.changes.append((ri, ci))
+                        uncovered += 1
+                        if self._map[ri][ci] == 0:
+                            stack.append((ri, ci))
+        self.remain -= uncovered
+
     def __mark(self, row: int, col: int) -> int:
         # Mark grid
-        if self.__mask[row][col] == MASK.UNKNOWN:
-            self.__mask[row][col] = MASK.MARKED
+        state = self._state(row, col)
+        if state == MASK.UNKNOWN:
+            self._set_state(row, col, MASK.MARKED)
+            self.changes.append((row, col))
             self.marked += 1
-        elif self.__mask[row][col] == MASK.MARKED:  # Unmark
-            self.__mask[row][col] = MASK.UNKNOWN
+        elif state == MASK.MARKED:  # Unmark
+            self._set_state(row, col, MASK.UNKNOWN)
+            self.changes.append((row, col))
             self.marked -= 1
         return 0
 
@@ -116,49 +201,6 @@ class MineGame(object):
             return self.__duration
 
     def show(self):
-        signs = {MASK.UNKNOWN: '█',
-                 MASK.MARKED: colored('ⓜ', 'yellow')}
-        if self.__map is None:
-            print(colored(' * * * No game to show, please start game:( * * *',
-                          'red'))
-            return
-        elif self.status == STATUS.RUNNING:
-            print(' * * * Game is running... * * *')
-        elif self.status == STATUS.WIN:
-            print(colored(' * * * Congratulations! You win:) * * *', 'yellow'))
-        else:
-            print(colored(' * * * Oops, you lose:( * * *', 'red'))
-        print(colored('    ♣ Time: {:.2f}s\n'
-                      '    ♣ Mines: {}\n'
-                      '    ♣ Remain: {}\n'
-                      '    ♣ Marked: {}\n'
-                      '    ♣ Moves: {}'.format(self.duration,
-                                               self.mines,
-                                               self.remain,
-                                               self.marked,
-                                               self.moves),
-                      'yellow'))
-        # Show grid line
-        index_row = '    '
-        for col in range(self.cols):
-            index_row += str(col % 10) + ' '
-        sep_row = '  ╔' + '═' * (len(index_row) - 3) + '╗'
-        print(index_row + '\n' + sep_row, end='')
-        print('\n', end='')
-        for row in range(self.rows):
-            print('{:2d}║ '.format(row), end='')
-            for col in range(self.cols):
-                state = self.__mask[row][col]
-                value = self.__map[row][col]
-                if state in signs:
-                    c = signs[state]
-                elif value == -1:
-                    c = colored('*', 'red')
-                elif value == 0:
-                    c = ' '
-                else:
-                    c = str(value)
-                print(c, end=' ')
-            print('║\n', end='')
-        sep_row = '  ╚' + '═' * (len(index_row) - 3) + '╝'
-        print(sep_row)
+        # Print the whole game
+        from game.render import Renderer
+        Renderer(ansi=False).draw(self, force=True)
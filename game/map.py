@@ -4,13 +4,42 @@ Mine-sweeper map class.
 import random
 
 
+def place_mines(rows: int, columns: int, total: int, row: int, col: int,
+                rng: random.Random = None, safe_area: bool = False) -> list:
+    # Sample positions (row * columns + col) of mines without retries,
+    # excluding the first cell [row, col] (and its neighbors if safe_area)
+    excluded = [row * columns + col]
+    if safe_area:
+        area = [ri * columns + ci
+                for ri in range(max(0, row - 1), min(rows, row + 2))
+                for ci in range(max(0, col - 1), min(columns, col + 2))]
+        # Fall back to excluding the first cell only for dense maps
+        if rows * columns - len(area) >= total:
+            excluded = area
+    return sample_positions(rows * columns, total, excluded, rng)
+
+
+def sample_positions(size: int, total: int, excluded: list,
+                     rng: random.Random = None) -> list:
+    # Sample total positions of range(size) but excluded ones, no retries
+    rng = rng or random
+    positions = rng.sample(range(size - len(excluded)), total)
+    # Shift positions past excluded cells
+    for index in sorted(excluded):
+        positions = [pos + 1 if pos >= index else pos for pos in positions]
+    return positions
+
+
 class Map(object):
     """Map of mine sweeper game."""
 
-    def __init__(self, rows: int, columns: int, total: int):
+    def __init__(self, rows: int, columns: int, total: int,
+                 rng: random.Random = None, safe_area: bool = False):
         self.__cols = columns
         self.__rows = rows
         self.__total = total
+        self.__rng = rng
+        self.__safe_area = safe_area
         self.__data = [[0 for _ in range(columns)] for _ in range(rows)]
         self.__flag = True
 
@@ -22,24 +51,23 @@ class Map(object):
 
     def __init_map(self, row: int, col: int):
         # Initialize mines at first attempt to avoid collision
-        for i in range(self.__total):
-            pos_row = random.randint(0, self.__rows - 1)
-            pos_col = random.randint(0, self.__cols - 1)
-            while (pos_col == col and pos_row == row) \
-                    or self.__data[pos_row][pos_col] != 0:
-                pos_row = random.randint(0, self.__rows - 1)
-                pos_col = random.randint(0, self.__cols - 1)
-            self.__data[pos_row][pos_col] = -1
+        positions = place_mines(self.__rows, self.__cols, self.__total, row,
+                                col, self.__rng, self.__safe_area)
+        self.place(positions)
+
+    def place(self, positions: list):
+        # Place mines at given positions (row * columns + col) instead of
+        # sampling them at first uncover, e.g., to restore a recorded game
+        self.__flag = False
+        for pos in positions:
+            self.__data[pos // self.__cols][pos % self.__cols] = -1
         # Initialize grids around mines
-        for row in range(self.__rows):
-            for col in range(self.__cols):
-                if self.__data[row][col] == 0:
-                    for ri in range(max(0, row - 1),
-                                    min(self.__rows, row + 2)):
-                        for ci in range(max(0, col - 1),
-                                        min(self.__cols, col + 2)):
-                            if self.__data[ri][ci] == -1:
-                                self.__data[row][col] += 1
+        for pos in positions:
+            row, col = divmod(pos, self.__cols)
+            for ri in range(max(0, row - 1), min(self.__rows, row + 2)):
+                for ci in range(max(0, col - 1), min(self.__cols, col + 2)):
+                    if self.__data[ri][ci] != -1:
+                        self.__data[ri][ci] += 1
 
     def __getitem__(self, index: int) -> list:
         # Access data: [i][j]
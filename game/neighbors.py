@@ -0,0 +1,31 @@
+"""
+Neighborhoods of cells on numpy boards, for one board or a stack of them:
+the last 2 axes are rows and columns.
+"""
+import numpy as np
+
+
+def shifted(cells: np.ndarray):
+    # The 9 windows of cells padded by 1, each shifted to one of the
+    # 3 x 3 neighbors of every cell
+    rows, cols = cells.shape[-2:]
+    padded = np.pad(cells, [(0, 0)] * (cells.ndim - 2) + [(1, 1), (1, 1)])
+    for dr in range(3):
+        for dc in range(3):
+            yield padded[..., dr:dr + rows, dc:dc + cols]
+
+
+def count_around(cells: np.ndarray) -> np.ndarray:
+    # Number of true cells among each cell and its 8 neighbors
+    counts = np.zeros(cells.shape, dtype=np.int8)
+    for window in shifted(cells.astype(np.int8)):
+        counts += window
+    return counts
+
+
+def dilate(cells: np.ndarray) -> np.ndarray:
+    # Cells and their 8 neighbors
+    result = np.zeros_like(cells)
+    for window in shifted(cells):
+        result |= window
+    return result
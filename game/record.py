@@ -0,0 +1,293 @@
+"""
+Compact binary records of mine-sweeper games.
+A record holds shape, seed, status, bit-packed mine layout, bit-packed mask
+and a varint encoded move log. Files of records carry an index of offsets,
+so any game can be read from a memory map without parsing the others.
+"""
+import mmap
+import struct
+from game.game import MineGame, STATUS, MASK, OPERATION, STATES, CODES
+
+MAGIC = b'MSGR\x01'
+INDEX_MAGIC = b'MSGI'
+# Footer: offset of index, number of records, magic
+FOOTER = struct.Struct('<QQ4s')
+OFFSET = struct.Struct('<Q')
+# Flags of a record
+HAS_SEED, HAS_MINES = 1, 2
+
+
+def write_varint(buffer: bytearray, value: int):
+    # Append unsigned int 7 bits per byte, lowest bits first
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, offset: int) -> tuple:
+    # Read unsigned int at offset, return (value, next offset)
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def pack_bits(values: list, width: int) -> bytes:
+    # Pack ints of `width` bits (1, 2, 4), lowest bits first
+    per = 8 // width
+    data = bytearray((len(values) + per - 1) // per)
+    for index, value in enumerate(values):
+        if value:
+            data[index // per] |= value << (index % per * width)
+    return bytes(data)
+
+
+def unpack_bits(data, width: int, count: int) -> list:
+    # Inverse of pack_bits
+    per, low = 8 // width, (1 << width) - 1
+    return [data[index // per] >> (index % per * width) & low
+            for index in range(count)]
+
+
+def dump(game: MineGame) -> bytes:
+    # Encode a game as a record
+    rows, cols = game.rows, game.cols
+    size = rows * cols
+    mines = [0] * size
+    codes = [0] * size
+    for row in range(rows):
+        for col in range(cols):
+            pos = row * cols + col
+            mines[pos] = int(game._map[row][col] == -1)
+            codes[pos] = CODES[game._state(row, col)]
+    # Mines are placed at first uncover, none of them before
+    placed = any(mines)
+    seed = game.seed if isinstance(game.seed, int) else None
+    buffer = bytearray()
+    for value in (rows, cols, game.mines):
+        write_varint(buffer, value)
+    buffer.append((HAS_SEED if seed is not None else 0) |
+                  (HAS_MINES if placed else 0))
+    if seed is not None:
+        # Zigzag encoding of signed seed
+        write_varint(buffer, seed * 2 if seed >= 0 else -seed * 2 - 1)
+    buffer.append(game.status.value + 1)
+    if placed:
+        buffer.extend(pack_bits(mines, 1))
+    buffer.extend(pack_bits(codes, 2))
+    history = game.history or []
+    write_varint(buffer, len(history))
+    for operation, row, col in history:
+        write_varint(buffer, (row * cols + col) << 1 |
+                     (operation == OPERATION.MARK))
+    return bytes(buffer)
+
+
+class GameRecord(object):
+    """Game record decoded lazily from a buffer."""
+
+    def __init__(self, data):
+        # data: bytes or memoryview of a record, not copied
+        data = memoryview(data)
+        self.rows, offset = read_varint(data, 0)
+        self.cols, offset = read_varint(data, offset)
+        self.mines, offset = read_varint(data, offset)
+        flags = data[offset]
+        offset += 1
+        self.seed = None
+        if flags & HAS_SEED:
+            seed, offset = read_varint(data, offset)
+            self.seed = seed >> 1 if seed & 1 == 0 else -(seed >> 1) - 1
+        self.status = STATUS(data[offset] - 1)
+        offset += 1
+        size = self.rows * self.cols
+        self.__mines = None
+        if flags & HAS_MINES:
+            self.__mines = data[offset:offset + (size + 7) // 8]
+            offset += (size + 7) // 8
+        self.__mask = data[offset:offset + (size + 3) // 4]
+        offset += (size + 3) // 4
+        self.moves, offset = read_varint(data, offset)
+        self.__moves = data[offset:]
+
+    def positions(self) -> list:
+        # Positions (row * columns + col) of mines, empty if not placed
+        positions = []
+        if self.__mines is None:
+            return positions
+        for index, byte in enumerate(self.__mines):
+            while byte:
+                low = byte & -byte
+                positions.append(index * 8 + low.bit_length() - 1)
+                byte ^= low
+        return positions
+
+    def states(self) -> list:
+        # Mask of all cells in row-major order
+        codes = unpack_bits(self.__mask, 2, self.rows * self.cols)
+        return [STATES[code] for code in codes]
+
+    def history(self) -> list:
+        # Moves of the game: (operation, row, col)
+        moves, offset = [], 0
+        for _ in range(self.moves):
+            value, offset = read_varint(self.__moves, offset)
+            row, col = divmod(value >> 1, self.cols)
+            moves.append((OPERATION.MARK if value & 1 else OPERATION.UNCOVER,
+                          row, col))
+        return moves
+
+    def __new_game(self, game: MineGame) -> MineGame:
+        # Start a game with the recorded mine layout
+        game = game or MineGame()
+        game.start(self.rows, self.cols, self.mines, self.seed)
+        if self.__mines is not None:
+            game._map.place(self.positions())
+        return game
+
+    def restore(self, game: MineGame = None) -> MineGame:
+        # Restore the recorded position directly, without replaying moves
+        game = self.__new_game(game)
+        for pos, state in enumerate(self.states()):
+            if state != MASK.UNKNOWN:
+                row, col = divmod(pos, self.cols)
+                game._set_state(row, col, state)
+                game.changes.append((row, col))
+                if state == MASK.KNOWN:
+                    game.remain -= 1
+                else:
+                    game.marked += 1
+        game.history = self.history()
+        game.moves, game.status = len(game.history), self.status
+        return game
+
+    def replay(self, count: int = None, game: MineGame = None) -> MineGame:
+        # Replay first `count` moves (all by default) on the recorded layout,
+        # e.g., count=-1 gives the position before a losing move
+        game = self.__new_game(game)
+        moves = self.history()[:count]
+        if moves:
+            game.move_many(moves)
+        return game
+
+
+def load(data) -> GameRecord:
+    return GameRecord(data)
+
+
+class GameWriter(object):
+    """Write game records to a file, index is written on close."""
+
+    def __init__(self, path: str):
+        self.__file = open(path, 'wb')
+        self.__file.write(MAGIC)
+        self.__offsets = []
+
+    def write(self, game: MineGame):
+        # Append a record of game, prefixed by its length
+        record = dump(game)
+        length = bytearray()
+        write_varint(length, len(record))
+        self.__offsets.append(self.__file.tell())
+        self.__file.write(bytes(length) + record)
+
+    def close(self):
+        if self.__file.closed:
+            return
+        index = self.__file.tell()
+        self.__file.write(b''.join(OFFSET.pack(offset)
+                                   for offset in self.__offsets))
+        self.__file.write(FOOTER.pack(index, len(self.__offsets),
+                                      INDEX_MAGIC))
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class GameReader(object):
+    """Random access to game records of a file through a memory map."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        assert self.__map[:len(MAGIC)] == MAGIC, 'Not a game record file'
+        self.__index, self.__count = self.__read_index()
+
+    def __read_index(self) -> tuple:
+        # Index written by GameWriter.close, or offsets found by skipping
+        # over records of an unfinished file
+        size = len(self.__map)
+        if size >= len(MAGIC) + FOOTER.size:
+            index, count, magic = FOOTER.unpack_from(self.__map,
+                                                     size - FOOTER.size)
+            if magic == INDEX_MAGIC and \
+                    index + count * OFFSET.size == size - FOOTER.size:
+                return index, count
+        offsets, offset = [], len(MAGIC)
+        while offset < size:
+            try:
+                length, start = read_varint(self.__map, offset)
+            except IndexError:  # Truncated length of record
+                break
+            if start + length > size:  # Truncated record
+                break
+            if not self.__valid(start, length):
+                # Part of an index written when the file was cut
+                break
+            offsets.append(offset)
+            offset = start + length
+        return offsets, len(offsets)
+
+    def __valid(self, start: int, length: int) -> bool:
+        # Whether bytes decode as a whole record, in files without index
+        try:
+            record = GameRecord(memoryview(self.__map)[start:start + length])
+            record.history()
+            return record.rows > 0 and record.cols > 0
+        except (IndexError, ValueError):
+            return False
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __getitem__(self, index: int) -> GameRecord:
+        if index < 0:
+            index += self.__count
+        if not 0 <= index < self.__count:
+            raise IndexError('Record index out of range')
+        if isinstance(self.__index, list):
+            offset = self.__index[index]
+        else:
+            offset, = OFFSET.unpack_from(self.__map,
+                                         self.__index + index * OFFSET.size)
+        length, start = read_varint(self.__map, offset)
+        return GameRecord(memoryview(self.__map)[start:start + length])
+
+    def __iter__(self):
+        for index in range(self.__count):
+            yield self[index]
+
+    def close(self):
+        # Close the memory map, unless records read from it are still
+        # alive: then it stays open until the last of them is released,
+        # and False is returned
+        try:
+            self.__map.close()
+        except BufferError:
+            return False
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
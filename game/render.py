@@ -0,0 +1,131 @@
+"""
+Terminal renderer of mine-sweeper games.
+Each frame is built in one buffer. On an ANSI terminal only cells and
+status lines changed since last frame are redrawn, by moving the cursor.
+"""
+import sys
+import time
+from termcolor import colored
+from game.game import MineGame, STATUS, MASK
+
+SIGNS = {MASK.UNKNOWN: '█',
+         MASK.MARKED: colored('ⓜ', 'yellow')}
+MINE = colored('*', 'red')
+TITLES = {STATUS.RUNNING: ' * * * Game is running... * * *',
+          STATUS.WIN: colored(' * * * Congratulations! You win:) * * *',
+                              'yellow'),
+          STATUS.LOSE: colored(' * * * Oops, you lose:( * * *', 'red')}
+
+
+def build_frame(game: MineGame) -> tuple:
+    # Build lines above grid, prefix of each grid row and symbols of cells
+    head = [TITLES[game.status]]
+    head.extend(colored(line, 'yellow') for line in [
+        '    ♣ Time: {:.2f}s'.format(game.duration),
+        '    ♣ Mines: {}'.format(game.mines),
+        '    ♣ Remain: {}'.format(game.remain),
+        '    ♣ Marked: {}'.format(game.marked),
+        '    ♣ Moves: {}'.format(game.moves)])
+    # Show grid line
+    index_row = '    ' + ''.join(str(col % 10) + ' ' for col in
+                                  range(game.cols))
+    head.append(index_row)
+    head.append('  ╔' + '═' * (len(index_row) - 3) + '╗')
+    prefixes, cells = [], []
+    for row in range(game.rows):
+        prefixes.append('{:2d}║ '.format(row))
+        symbols = []
+        for col in range(game.cols):
+            state = game._state(row, col)
+            if state in SIGNS:
+                symbols.append(SIGNS[state])
+            else:
+                value = game._map[row][col]
+                if value == -1:
+                    symbols.append(MINE)
+                elif value == 0:
+                    symbols.append(' ')
+                else:
+                    symbols.append(str(value))
+        cells.append(symbols)
+    return head, prefixes, cells
+
+
+class Renderer(object):
+    """Draw frames of a game to a text stream."""
+
+    def __init__(self, stream=None, fps: float = None, headless: bool = False,
+                 ansi: bool = None):
+        # fps: max frames per second, extra frames are skipped
+        # headless: draw nothing at all
+        # ansi: redraw changed cells only, default to whether the stream
+        # is a terminal
+        self.stream = stream or sys.stdout
+        self.fps = fps
+        self.headless = headless
+        self.ansi = self.stream.isatty() if ansi is None else ansi
+        self.__last = 0.
+        # Last frame drawn: (head, prefixes, cells)
+        self.__frame = None
+
+    def draw(self, game: MineGame, force: bool = False):
+        # Draw a frame of game, force to draw it regardless of frame rate
+        if self.headless:
+            return
+        now = time.perf_counter()
+        if not force and self.fps and now - self.__last < 1 / self.fps:
+            return
+        self.__last = now
+        if game._map is None:
+            self.__frame = None
+            self.stream.write(colored(
+                ' * * * No game to show, please start game:( * * *',
+                'red') + '\n')
+            self.stream.flush()
+            return
+        frame = build_frame(game)
+        if self.ansi and self.__frame is not None and \
+                self.__frame[1] == frame[1] and \
+                len(self.__frame[0]) == len(frame[0]) and \
+                len(self.__frame[2][0]) == len(frame[2][0]):
+            text = self.__diff(self.__frame, frame)
+        else:
+            text = self.__full(frame)
+        self.__frame = frame
+        self.stream.write(text)
+        self.stream.flush()
+
+    def reset(self):
+        # Draw next frame in full
+        self.__frame = None
+
+    def __full(self, frame: tuple) -> str:
+        head, prefixes, cells = frame
+        lines = list(head)
+        for prefix, symbols in zip(prefixes, cells):
+            lines.append(prefix + ' '.join(symbols) + ' ║')
+        lines.append('  ╚' + '═' * (len(head[-2]) - 3) + '╝')
+        text = '\n'.join(lines) + '\n'
+        if self.ansi:
+            # Clear screen and draw from top left corner
+            text = '\x1b[2J\x1b[H' + text
+        return text
+
+    @staticmethod
+    def __diff(previous: tuple, frame: tuple) -> str:
+        # Move cursor to changed lines / cells and redraw them only
+        head, prefixes, cells = frame
+        parts = []
+        for i, line in enumerate(head):
+            if line != previous[0][i]:
+                parts.append('\x1b[{};1H\x1b[2K{}'.format(i + 1, line))
+        for row, symbols in enumerate(cells):
+            last_symbols = previous[2][row]
+            for col, symbol in enumerate(symbols):
+                if symbol != last_symbols[col]:
+                    parts.append('\x1b[{};{}H{}'.format(
+                        len(head) + row + 1,
+                        len(prefixes[row]) + 2 * col + 1, symbol))
+        # Leave cursor below the frame
+        parts.append('\x1b[{};1H'.format(len(head) + len(cells) + 2))
+        return ''.join(parts)
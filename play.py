@@ -2,6 +2,7 @@ import time
 import logging
 from termcolor import colored
 from game import MineGame, STATUS, OPERATION
+from game.render import Renderer
 from auto import MineBot
 
 HEADING = colored("""
@@ -16,12 +17,15 @@ HEADING = colored("""
 GAME = MineGame()
 BOT = MineBot()
 INTERVAL = 0.10
+# Redraw changed cells only, at most 30 frames per second
+RENDERER = Renderer(fps=30)
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger('main')
 
 
 def play_manual() -> list:
-    # Play a game manually
+    # Play a game manually, prompt scrolls the screen so redraw in full
+    RENDERER.reset()
     move = input('Input row and column position to uncover or mark:\n'
                  'e.g., `1 3 5` as to uncover grid[3][5];\n'
                  '`2 4 6` as to mark grid[4][6])\n'
@@ -57,7 +61,8 @@ def main():
             assert mode in play_modes
             play = play_modes[mode]
             GAME.start(*params)
-            GAME.show()
+            RENDERER.reset()
+            RENDERER.draw(GAME, force=True)
             # Continuously playing
             while GAME.status == STATUS.RUNNING:
                 # Generate a sequence of operations
@@ -65,10 +70,11 @@ def main():
                     move_list = play()
                     for move in move_list:
                         GAME.move(*move)
-                        GAME.show()
+                        RENDERER.draw(GAME)
                         time.sleep(INTERVAL)
                         # Game is over
                         if GAME.status != STATUS.RUNNING:
+                            RENDERER.draw(GAME, force=True)
                             logger.info('Last move: {}'.format(move))
                             break
                 except (IndexError, ValueError, AssertionError):
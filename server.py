@@ -0,0 +1,219 @@
+"""
+Asyncio server hosting many mine-sweeper games over a JSON-lines protocol.
+Each request is a JSON object on one line, answered by one JSON line:
+    {"op": "start", "rows": 16, "cols": 30, "mines": 99, "seed": 1}
+    {"op": "move", "game": 1, "operation": 1, "row": 3, "col": 5}
+    {"op": "view", "game": 1, "top": 0, "left": 0, "height": 8, "width": 8}
+    {"op": "status", "game": 1}
+    {"op": "bot", "game": 1, "turns": 1, "deadline": 0.05}
+    {"op": "close", "game": 1}
+An optional "id" of a request is copied to its response. Games belong to
+the connection that started them. Bot turns run in threads and bots solve
+large groups in worker processes, so slow solves do not stall other
+connections.
+"""
+import os
+import sys
+import json
+import random
+import asyncio
+import logging
+import argparse
+from game import MineGame, STATUS, OPERATION
+from auto import MineBot
+from auto.pool import get_pool
+
+# Number of processes solving large groups for bots, None for all CPUs,
+# 0 to solve them in threads of bot turns
+WORKERS = None
+# Largest board (rows * columns) a client may start
+MAX_CELLS = 1000000
+# Longest request line in bytes, and what stands for a longer one
+LINE_LIMIT, OVERLONG = 1 << 16, b'\0'
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('server')
+
+
+def summary(game: MineGame) -> dict:
+    return {'status': game.status.name.lower(), 'rows': game.rows,
+            'cols': game.cols, 'mines': game.mines, 'remain': game.remain,
+            'marked': game.marked, 'moves': game.moves}
+
+
+class Connection(object):
+    """Games of a client connection and handlers of its requests."""
+
+    def __init__(self, workers: int, max_cells: int = MAX_CELLS):
+        self.workers = workers
+        self.max_cells = max_cells
+        # Game id -> [game, bot], bot is created on first bot request
+        self.sessions = {}
+        self.__next_id = 1
+
+    def __session(self, request: dict) -> list:
+        session = self.sessions.get(request.get('game'))
+        assert session is not None, 'No such game'
+        return session
+
+    async def handle(self, request: dict) -> dict:
+        handlers = {'start': self.start, 'move': self.move,
+                    'view': self.view, 'status': self.status,
+                    'bot': self.bot, 'close': self.close}
+        assert request.get('op') in handlers, 'Unknown op'
+        return await handlers[request['op']](request)
+
+    async def start(self, request: dict) -> dict:
+        rows, cols = int(request['rows']), int(request['cols'])
+        mines = int(request['mines'])
+        # Refuse boards too large to allocate before creating them
+        assert rows * cols <= self.max_cells, \
+            'Board is larger than {} cells'.format(self.max_cells)
+        game = MineGame()
+        game.start(rows, cols, mines, request.get('seed'),
+                   bool(request.get('safe_area', False)))
+        game_id, self.__next_id = self.__next_id, self.__next_id + 1
+        self.sessions[game_id] = [game, None]
+        return dict(summary(game), game=game_id)
+
+    async def move(self, request: dict) -> dict:
+        game = self.__session(request)[0]
+        value = game.move(OPERATION(request['operation']),
+                          int(request['row']), int(request['col']))
+        return dict(summary(game), value=value)
+
+    async def view(self, request: dict) -> dict:
+        # Visible values of a window of the board, the whole board by default
+        game = self.__session(request)[0]
+        top, left = int(request.get('top', 0)), int(request.get('left', 0))
+        height = int(request.get('height', game.rows - top))
+        width = int(request.get('width', game.cols - left))
+        return dict(summary(game), board=game.region(top, left, height,
+                                                     width))
+
+    async def status(self, request: dict) -> dict:
+        return summary(self.__session(request)[0])
+
+    async def bot(self, request: dict) -> dict:
+        # Let a bot play given turns, 0 to play until game is over,
+        # each turn within deadline seconds if given
+        session = self.__session(request)
+        game, bot = session
+        if bot is None:
+            seed = request.get('seed', random.randrange(2 ** 32))
+            bot = session[1] = MineBot(workers=self.workers, seed=seed)
+        turns, played = int(request.get('turns', 1)), []
+        deadline, timeouts = request.get('deadline'), 0
+        loop = asyncio.get_running_loop()
+        while game.status == STATUS.RUNNING and \
+                (turns <= 0 or len(played) < turns):
+            # Analyze in a thread to keep serving other connections
+            moves = await loop.run_in_executor(None, bot.analyze, game,
+                                               deadline)
+            timeouts += bot.timed_out
+            applied = len(game.move_many(moves)['values'])
+            played.append([[operation.value, row, col]
+                           for operation, row, col in moves[:applied]])
+        return dict(summary(game), turns=played, timeouts=timeouts)
+
+    async def close(self, request: dict) -> dict:
+        game = self.__session(request)[0]
+        del self.sessions[request['game']]
+        return summary(game)
+
+
+async def read_line(reader: asyncio.StreamReader) -> bytes:
+    # Read a line, b'' at end of stream. A line over the limit of the
+    # stream is discarded up to its end and OVERLONG is returned instead
+    try:
+        return await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError as e:
+        consumed = e.consumed
+    while True:
+        # Drop the part read so far, look for the end again
+        try:
+            await reader.readexactly(consumed)
+            await reader.readuntil(b'\n')
+            return OVERLONG
+        except asyncio.IncompleteReadError:
+            return b''
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+
+
+async def serve_client(reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter, workers: int,
+                       max_cells: int = MAX_CELLS):
+    # Answer requests of a client in order until it disconnects
+    connection = Connection(workers, max_cells)
+    try:
+        while True:
+            line = await read_line(reader)
+            if not line:
+                break
+            response = {}
+            try:
+                assert line != OVERLONG, 'Request line over {} bytes'.format(
+                    LINE_LIMIT)
+                request = json.loads(line)
+                assert isinstance(request, dict), 'Request must be an object'
+                if 'id' in request:
+                    response['id'] = request['id']
+                response.update(await connection.handle(request))
+                response['ok'] = True
+            except (AssertionError, KeyError, IndexError, ValueError,
+                    TypeError) as e:
+                response.update(ok=False, error=str(e) or type(e).__name__)
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str = '127.0.0.1', port: int = 8765,
+                path: str = None, workers: int = WORKERS,
+                max_cells: int = MAX_CELLS):
+    # Serve on a TCP port, or on a Unix socket if path is given
+    workers = os.cpu_count() if workers is None else workers
+    if workers > 0:
+        # Create the shared pool before bot threads race to do it
+        get_pool(workers)
+
+    def handler(reader, writer):
+        return serve_client(reader, writer, workers, max_cells)
+
+    if path:
+        server = await asyncio.start_unix_server(handler, path,
+                                                 limit=LINE_LIMIT)
+    else:
+        server = await asyncio.start_server(handler, host, port,
+                                            limit=LINE_LIMIT)
+    logger.info('Serving on {}'.format(
+        ', '.join(str(sock.getsockname()) for sock in server.sockets)))
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='path of Unix socket to serve on')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help='processes solving large groups for bots, '
+                             '0 to solve them in threads')
+    parser.add_argument('--max-cells', type=int, default=MAX_CELLS,
+                        help='largest board (rows * columns) to start')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers,
+                          args.max_cells))
+    except KeyboardInterrupt:
+        print('Have a nice day:)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,89 @@
 """
 Test codes for auto-playing.
+Games are spread over processes, each game has its own seed so results
+are reproducible. Results of games are streamed as JSON lines.
 """
-import tqdm
+import sys
+import json
+import time
+import random
 import logging
-import matplotlib.pyplot as plt
+from multiprocessing import Pool
 from game import MineGame, STATUS
 from auto import MineBot
 
+try:
+    import tqdm
+except ImportError:
+    tqdm = None
+try:
+    import matplotlib.pyplot as plt
+except ImportError:
+    plt = None
+
 BOT = MineBot()
 GAME = MineGame()
+# Number of processes, None for all CPUs
+PROCESSES = None
+# Seconds each move of the bot should be decided within, None for no limit
+DEADLINE = None
 logging.basicConfig(level=logging.INFO)
 
 
-def test(shape: tuple, mines: int, total: int) -> float:
-    win = 0
-    progress_bar = tqdm.tqdm(total=total)
-    for i in range(total):
-        GAME.start(*shape, mines)
-        while GAME.status == STATUS.RUNNING:
-            moves = BOT.analyze(GAME)
-            for move in moves:
-                GAME.move(*move)
-                if GAME.status != STATUS.RUNNING:
-                    break
-        win += GAME.status == STATUS.WIN
-        progress_bar.update(1)
-    progress_bar.close()
-    return win / total
+def play(task: tuple) -> dict:
+    # Play a game with given seed, return its result
+    shape, mines, seed = task
+    GAME.start(*shape, mines, seed=seed)
+    BOT.rng = random.Random(seed)
+    latencies, timeouts = [], 0
+    while GAME.status == STATUS.RUNNING:
+        start = time.perf_counter()
+        moves = BOT.analyze(GAME, DEADLINE)
+        latencies.append(time.perf_counter() - start)
+        timeouts += BOT.timed_out
+        GAME.move_many(moves)
+    return {'rows': shape[0], 'cols': shape[1], 'mines': mines,
+            'seed': seed, 'win': GAME.status == STATUS.WIN,
+            'moves': GAME.moves, 'time': GAME.duration,
+            'timeouts': timeouts, 'latencies': latencies}
+
+
+def percentile(values: list, rate: float) -> float:
+    # Value at given rate of sorted values
+    if not values:
+        return 0.
+    return values[min(len(values) - 1, int(rate * len(values)))]
+
+
+def test(shape: tuple, mines: int, total: int, seed: int = 0,
+         output=sys.stdout) -> dict:
+    # Play games with seeds [seed, seed + total), return summary
+    win, moves, latencies = 0, 0, []
+    tasks = [(shape, mines, seed + i) for i in range(total)]
+    progress_bar = tqdm.tqdm(total=total) if tqdm else None
+    start = time.perf_counter()
+    with Pool(PROCESSES) as pool:
+        for result in pool.imap_unordered(play, tasks, chunksize=8):
+            win += result['win']
+            moves += result['moves']
+            latencies.extend(result.pop('latencies'))
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            if progress_bar:
+                progress_bar.update(1)
+    elapsed = time.perf_counter() - start
+    if progress_bar:
+        progress_bar.close()
+    # Latency of each decision of the bot, in milliseconds
+    latencies = sorted(latency * 1000 for latency in latencies)
+    return {'rows': shape[0], 'cols': shape[1], 'mines': mines,
+            'games': total, 'win_rate': win / total,
+            'games_per_sec': total / elapsed,
+            'moves_per_sec': moves / elapsed,
+            'latency_ms': {'p50': percentile(latencies, 0.5),
+                           'p90': percentile(latencies, 0.9),
+                           'p99': percentile(latencies, 0.99),
+                           'max': percentile(latencies, 1.)}}
 
 
 def main():
@@ -37,26 +94,27 @@ def main():
     for dense in mine_denses:
         mines = int(dense * shape[0] * shape[1])
         logging.info('Test mine dense: {:.3f}'.format(dense))
-        win_rates.append(test(shape, mines, 1000))
-        logging.info(
-            'Mine dense: {:.3f}, win rate: {:.3f}'.format(dense,
-                                                          win_rates[-1]))
-    plt.plot(mine_denses, win_rates)
-    plt.savefig('test.png')
-    plt.show()
-    print('Win rates:', win_rates)
+        summary = test(shape, mines, 1000)
+        win_rates.append(summary['win_rate'])
+        logging.info('Mine dense: {:.3f}, summary: {}'.format(
+            dense, json.dumps(summary)))
+    if plt:
+        plt.plot(mine_denses, win_rates)
+        plt.savefig('test.png')
+        plt.show()
+    print('Win rates:', win_rates, file=sys.stderr)
 
 
 def classic_test():
     names = ['Primary', 'Medium', 'Advanced']
     shapes = [(8, 8), (16, 16), (30, 16)]
     mines = [10, 40, 99]
-    win_rates = []
     for i in range(3):
         logging.info('Test {}'.format(names[i]))
-        win_rates.append(test(shapes[i], mines[i], 1000))
+        summary = test(shapes[i], mines[i], 1000)
         logging.info(
-            'Mine count: {}, win rate: {}'.format(mines[i], win_rates[-1]))
+            'Mine count: {}, summary: {}'.format(mines[i],
+                                                 json.dumps(summary)))
 
 
 if __name__ == '__main__':